@@ -0,0 +1,92 @@
+import cv2
+
+# (scale, JPEG quality) from most to least expensive: quality drops first,
+# then resolution, each step cutting frame size by roughly a fifth to a third
+DEFAULT_LEVELS = [
+    (1.0, 90), (1.0, 80), (1.0, 70), (1.0, 60),
+    (0.75, 70), (0.75, 60), (0.75, 50),
+    (0.5, 60), (0.5, 50), (0.5, 40),
+]
+
+
+class AdaptiveEncoder:
+    """
+    JPEG encoder that picks quality and transmit resolution from the observed
+    round-trip time and throughput.
+
+    observe() is fed the RTT of each answered frame. While the smoothed RTT is
+    above `target_rtt` the encoder steps down the level ladder; when it is
+    comfortably below and the measured throughput leaves room for the larger
+    frames of the level above, it steps back up. At least `hold` observations
+    pass between changes so each level gets measured before the next decision.
+    Levels outside [min_quality, max_quality] and below min_scale are skipped.
+    """
+
+    def __init__(self, base_size=(640, 480), target_rtt=0.2, min_quality=40, max_quality=90,
+                 min_scale=0.5, levels=DEFAULT_LEVELS, hold=10, name="encoder"):
+        self.base_size = base_size
+        self.target_rtt = target_rtt
+        self.levels = [(s, q) for s, q in levels if min_quality <= q <= max_quality and s >= min_scale]
+        self.hold = hold
+        self.name = name
+        self.level = 0
+        self.srtt = None
+        self.throughput = None  # bytes per second
+        self.last_bytes = 0
+        self._since_change = 0
+
+    @property
+    def settings(self):
+        scale, quality = self.levels[self.level]
+        width, height = int(self.base_size[0] * scale), int(self.base_size[1] * scale)
+        return {"quality": quality, "width": width, "height": height}
+
+    def encode(self, img):
+        """Resize and JPEG-encode `img` at the current level; returns (buffer, settings)."""
+        settings = self.settings
+        size = (settings["width"], settings["height"])
+        if (img.shape[1], img.shape[0]) != size:
+            img = cv2.resize(img, size, interpolation=cv2.INTER_AREA)
+        _, buffer = cv2.imencode('.jpg', img, [cv2.IMWRITE_JPEG_QUALITY, settings["quality"]])
+        self.last_bytes = len(buffer)
+        return buffer, settings
+
+    def observe(self, rtt, nbytes=None, service_time=0.0):
+        """
+        Feed the round-trip time of an answered frame of `nbytes` (default: the
+        last one encoded), `service_time` of which the far end spent processing
+        it rather than transferring it.
+        """
+        if rtt is None or rtt <= 0:
+            return
+        nbytes = self.last_bytes if nbytes is None else nbytes
+        self.srtt = rtt if self.srtt is None else 0.875 * self.srtt + 0.125 * rtt
+        if nbytes:
+            rate = nbytes / max(rtt - (service_time or 0.0), 0.1 * rtt)
+            self.throughput = rate if self.throughput is None else 0.875 * self.throughput + 0.125 * rate
+
+        self._since_change += 1
+        if self._since_change < self.hold:
+            return
+
+        if self.srtt > self.target_rtt and self.level < len(self.levels) - 1:
+            self._set_level(self.level + 1)
+        elif self.srtt < 0.7 * self.target_rtt and self.level > 0 and self._room_for(self.level - 1):
+            self._set_level(self.level - 1)
+
+    def _room_for(self, level):
+        # Would the larger frames of `level` still be sent within the target RTT?
+        if not self.throughput or not self.last_bytes:
+            return True
+        (scale, quality), (cur_scale, cur_quality) = self.levels[level], self.levels[self.level]
+        ratio = (scale / cur_scale) ** 2 * (1.0 + 0.02 * (quality - cur_quality))
+        return self.last_bytes * ratio / self.throughput < 0.5 * self.target_rtt
+
+    def _set_level(self, level):
+        old = self.settings
+        self.level = level
+        self._since_change = 0
+        new = self.settings
+        print(f"[{self.name}] quality {old['quality']} -> {new['quality']}, "
+              f"{old['width']}x{old['height']} -> {new['width']}x{new['height']} "
+              f"(srtt {self.srtt * 1e3:.0f} ms, throughput {(self.throughput or 0) / 1e3:.0f} kB/s)")
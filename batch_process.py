@@ -0,0 +1,186 @@
+"""
+Headless batch mode: run the obj_v2 tracking and trail drawing over recorded
+footage as fast as the machine allows.
+
+    python batch_process.py footage.mp4 --canvas trails.png --video annotated.mp4 --trajectories tracks.csv
+    python batch_process.py frames_dir/ --fps 10 --canvas trails.png
+    python batch_process.py footage.mp4 --log trails.log  # re-render with replay_trails.py
+
+Frames are decoded and resized on a prefetch thread, the detector runs on
+batches of frames, and tracking runs frame by frame in order on one tracker,
+so the result matches processing the footage live without dropped frames.
+"""
+import argparse
+import csv
+import os
+import queue
+import threading
+import time
+import cv2
+from information import allowed_class_ids, classNames
+from overlay import draw_detections
+from compositor import TrailCompositor
+from detector_backend import BACKENDS, load_model
+from postprocess import extract_detections
+from sessions import apply_tracker, new_tracker
+from trail_renderer import TrailRenderer
+from trajectory_store import TrajectoryStore
+from trajectory_log import TrajectoryLog
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".bmp", ".tif", ".tiff"}
+
+
+def source_fps(source):
+    """Frame rate of a video file; 30 for image directories or when unknown."""
+    if os.path.isdir(source):
+        return 30.0
+    cap = cv2.VideoCapture(source)
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    cap.release()
+    return fps or 30.0
+
+
+def read_frames(source, fps):
+    """Yield (timestamp, frame) from a video file or a directory of images."""
+    if os.path.isdir(source):
+        names = sorted(n for n in os.listdir(source) if os.path.splitext(n)[1].lower() in IMAGE_EXTENSIONS)
+        for i, name in enumerate(names):
+            img = cv2.imread(os.path.join(source, name), cv2.IMREAD_COLOR)
+            if img is not None:
+                yield i / fps, img
+        return
+
+    cap = cv2.VideoCapture(source)
+    if not cap.isOpened():
+        raise FileNotFoundError(f"cannot open {source}")
+    i = 0
+    try:
+        while True:
+            success, img = cap.read()
+            if not success:
+                break
+            yield i / fps, img
+            i += 1
+    finally:
+        cap.release()
+
+
+def prefetch(frames, resize, depth):
+    """Decode and resize on a background thread; yields (timestamp, frame, resized)."""
+    buffer = queue.Queue(maxsize=depth)
+    done = object()
+
+    def worker():
+        try:
+            for timestamp, img in frames:
+                buffer.put((timestamp, img, cv2.resize(img, resize)))
+        finally:
+            buffer.put(done)
+
+    threading.Thread(target=worker, daemon=True).start()
+    while True:
+        item = buffer.get()
+        if item is done:
+            return
+        yield item
+
+
+def batches(items, size):
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def process(args):
+    fps = args.fps or source_fps(args.source)
+    # predict() takes batches of any size (the last is usually short); fixed-batch exports fall back to PyTorch
+    model = load_model(args.weights, args.backend, int8=args.int8, threads=args.threads, dynamic=True)
+    tracker = new_tracker(args.tracker, frame_rate=round(fps))
+    trajectories = TrajectoryStore(capacity=args.trail_history, ttl=args.track_ttl)
+    renderer = TrailRenderer(thickness=args.line_thickness, smooth=args.smooth)
+    compositor = None
+    writer = None
+    log = None
+    track_file = open(args.trajectories, "w", newline="") if args.trajectories else None
+    track_rows = csv.writer(track_file) if track_file else None
+    if track_rows:
+        track_rows.writerow(["frame", "time", "track_id", "class", "x", "y"])
+
+    frames = 0
+    start = time.perf_counter()
+    source = prefetch(read_frames(args.source, fps), (args.resize_width, args.resize_height), args.batch * 4)
+    try:
+        for batch in batches(source, args.batch):
+            results = model.predict([resized for _, _, resized in batch], classes=allowed_class_ids, verbose=False)
+
+            for (timestamp, img, resized), result in zip(batch, results):
+                # Tracking has to see frames one by one, in order
+                result = apply_tracker(result, tracker, resized)
+                scale_x = img.shape[1] / args.resize_width
+                scale_y = img.shape[0] / args.resize_height
+                detections = extract_detections([result], scale_x, scale_y)
+
+                if compositor is None:
+                    compositor = TrailCompositor(img.shape, args.line_intensity)
+                    if args.log:
+                        log = TrajectoryLog(args.log, (img.shape[1], img.shape[0]))
+                trajectories.evict_stale(timestamp)
+                draw_detections(img, compositor, detections, trajectories, renderer, timestamp)
+                if log is not None:
+                    log.append(detections, timestamp)
+
+                if track_rows:
+                    for d in detections[detections["id"] >= 0].tolist():
+                        track_rows.writerow([frames, f"{timestamp:.3f}", d[8], classNames[d[6]], d[4], d[5]])
+
+                if args.video:
+                    if writer is None:
+                        fourcc = cv2.VideoWriter_fourcc(*"mp4v")
+                        writer = cv2.VideoWriter(args.video, fourcc, fps, (img.shape[1], img.shape[0]))
+                    writer.write(compositor.blend(img))
+                frames += 1
+
+            if frames % (args.batch * 25) < args.batch:
+                elapsed = time.perf_counter() - start
+                print(f"{frames} frames, {frames / elapsed:.1f} fps")
+    finally:
+        if writer is not None:
+            writer.release()
+        if track_file is not None:
+            track_file.close()
+        if log is not None:
+            log.close()
+
+    elapsed = time.perf_counter() - start
+    print(f"Processed {frames} frames in {elapsed:.1f} s ({frames / max(elapsed, 1e-9):.1f} fps end to end)")
+    if args.canvas and compositor is not None:
+        cv2.imwrite(args.canvas, compositor.canvas)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("source", help="video file or directory of images")
+    parser.add_argument("--canvas", help="write the final trail canvas to this image")
+    parser.add_argument("--video", help="write the annotated video to this file")
+    parser.add_argument("--trajectories", help="write tracked positions to this CSV file")
+    parser.add_argument("--log", help="append the drawn track points to this trajectory log")
+    parser.add_argument("--weights", default="yolov8m.pt")
+    parser.add_argument("--backend", choices=BACKENDS, default="torch", help="detector runtime (see detector_backend.py)")
+    parser.add_argument("--int8", action="store_true", help="use the INT8-quantized export")
+    parser.add_argument("--threads", type=int, default=None, help="CPU threads for inference")
+    parser.add_argument("--tracker", default="bytetrack.yaml")
+    parser.add_argument("--batch", type=int, default=8, help="frames per detector call")
+    parser.add_argument("--fps", type=float, default=None, help="source frame rate (default: from the video, or 30)")
+    parser.add_argument("--resize-width", type=int, default=640)
+    parser.add_argument("--resize-height", type=int, default=480)
+    parser.add_argument("--line-thickness", type=int, default=2)
+    parser.add_argument("--line-intensity", type=float, default=0.9)
+    parser.add_argument("--trail-history", type=int, default=100)
+    parser.add_argument("--track-ttl", type=float, default=5.0)
+    parser.add_argument("--smooth", action="store_true", help="anti-aliased curved trail segments")
+    process(parser.parse_args())
@@ -0,0 +1,84 @@
+import time
+from inference_worker import InferenceWorker
+from pipeline import StageStats
+
+
+class BatchScheduler(InferenceWorker):
+    """
+    InferenceWorker that batches frames across clients.
+
+    Once a frame is pending, the worker waits up to `max_wait` seconds for
+    frames from other clients, then calls `process_batch([(sid, data), ...])`
+    with at most `batch_size` of them (one per client, newest frame each) and
+    emits every (sid, result) it returns. Larger batches raise throughput on
+    CPU at the cost of up to `max_wait` extra latency per frame.
+    """
+
+    def __init__(self, process_batch, emit, batch_size=4, max_wait=0.02, report_interval=30.0):
+        super().__init__(None, emit)
+        self.process_batch = process_batch
+        self.batch_size = batch_size
+        self.max_wait = max_wait
+        self.report_interval = report_interval
+        self.latency = StageStats()  # submit -> emit, per sid
+        self.batch_sizes = StageStats()
+
+    def submit(self, sid, data):
+        # Timestamp each frame so per-session latency includes time spent queued
+        replaced = super().submit(sid, (data, time.perf_counter()))
+        return None if replaced is None else replaced[0]
+
+    def _next_batch(self):
+        with self._cond:
+            self._cond.wait_for(lambda: self._pending or not self._running)
+            deadline = time.perf_counter() + self.max_wait
+            while self._running and len(self._pending) < self.batch_size:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            if not self._running:
+                return None
+
+            batch = []
+            for sid in list(self._pending)[:self.batch_size]:
+                batch.append((sid, self._pending.pop(sid)))
+            return batch
+
+    def _run(self):
+        frames = 0
+        last_report = time.perf_counter()
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+
+            submitted = {sid: submitted_at for sid, (_, submitted_at) in batch}
+            try:
+                results = self.process_batch([(sid, data) for sid, (data, _) in batch])
+            except Exception as e:  # one bad batch must not stop the worker
+                print(f"Batch inference failed: {e}")
+                continue
+
+            for sid, result in results:
+                active = self._count_processed(sid)
+                if result is not None:
+                    self.emit(sid, result)
+                    if active:
+                        self.latency.add(sid, time.perf_counter() - submitted[sid])
+            frames += len(batch)
+            self.batch_sizes.add("batch", len(batch))
+
+            now = time.perf_counter()
+            if now - last_report > self.report_interval:
+                print(f"[scheduler] throughput={frames / (now - last_report):.1f} fps "
+                      f"mean batch={self.mean_batch_size():.2f} latency {self.latency.summary()}")
+                frames = 0
+                last_report = now
+
+    def mean_batch_size(self):
+        return self.batch_sizes.mean("batch")
+
+    def discard(self, sid):
+        super().discard(sid)
+        self.latency.discard(sid)
@@ -0,0 +1,125 @@
+"""
+Latency and accuracy of the detector backends on a recorded clip, against
+PyTorch FP32 as the reference.
+
+    python bench_backends.py clip.mp4 --weights yolov8m.pt --threads 4
+    python bench_backends.py clip.mp4 --configs torch,onnx,onnx-int8,openvino-int8 --frames 300
+
+Export the models first (see detector_backend.py); configurations without an
+export are skipped. Frames are resized to 640x480 as in obj_v2 and run one at
+a time. Accuracy is agreement with the reference: a detection matches a
+reference box of the same class with IoU >= 0.5. Reported are precision and
+recall against the reference, the mean IoU of matches and the mean
+confidence difference.
+"""
+import argparse
+import os
+import time
+import cv2
+import numpy as np
+from detector_backend import exported_path, load_model
+from postprocess import extract_detections
+
+
+def read_clip(source, frames, size):
+    cap = cv2.VideoCapture(source)
+    if not cap.isOpened():
+        raise FileNotFoundError(f"cannot open {source}")
+    clip = []
+    while len(clip) < frames:
+        success, img = cap.read()
+        if not success:
+            break
+        clip.append(cv2.resize(img, size))
+    cap.release()
+    return clip
+
+
+def run(model, clip, warmup=5):
+    """Detections for every frame and per-frame latency, after `warmup` untimed frames."""
+    for img in clip[:warmup]:
+        model.predict(img, verbose=False)
+    detections, times = [], []
+    for img in clip:
+        start = time.perf_counter()
+        results = model.predict(img, verbose=False)
+        times.append(time.perf_counter() - start)
+        detections.append(extract_detections(results))
+    return detections, np.array(times)
+
+
+def iou(a, b):
+    """IoU matrix between two DETECTION_DTYPE arrays."""
+    ax1, ay1, ax2, ay2 = (a[k][:, None].astype(np.float32) for k in ("x1", "y1", "x2", "y2"))
+    bx1, by1, bx2, by2 = (b[k][None, :].astype(np.float32) for k in ("x1", "y1", "x2", "y2"))
+    w = np.clip(np.minimum(ax2, bx2) - np.maximum(ax1, bx1), 0, None)
+    h = np.clip(np.minimum(ay2, by2) - np.maximum(ay1, by1), 0, None)
+    inter = w * h
+    union = (ax2 - ax1) * (ay2 - ay1) + (bx2 - bx1) * (by2 - by1) - inter
+    return inter / np.maximum(union, 1e-6)
+
+
+def agreement(reference, candidate, threshold=0.5):
+    """Greedy same-class matching at `threshold` IoU over all frames."""
+    matched, ious, conf_diffs = 0, [], []
+    total_ref = total_cand = 0
+    for ref, cand in zip(reference, candidate):
+        total_ref += len(ref)
+        total_cand += len(cand)
+        if not len(ref) or not len(cand):
+            continue
+        overlap = iou(ref, cand)
+        overlap[ref["cls"][:, None] != cand["cls"][None, :]] = 0
+        while True:
+            i, j = np.unravel_index(np.argmax(overlap), overlap.shape)
+            if overlap[i, j] < threshold:
+                break
+            matched += 1
+            ious.append(overlap[i, j])
+            conf_diffs.append(abs(float(ref["conf"][i]) - float(cand["conf"][j])))
+            overlap[i, :] = 0
+            overlap[:, j] = 0
+    return {
+        "precision": matched / total_cand if total_cand else 1.0,
+        "recall": matched / total_ref if total_ref else 1.0,
+        "iou": float(np.mean(ious)) if ious else 0.0,
+        "conf": float(np.mean(conf_diffs)) if conf_diffs else 0.0,
+    }
+
+
+def parse_config(config):
+    backend, _, variant = config.partition("-")
+    return backend, variant == "int8"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("source", help="recorded clip")
+    parser.add_argument("--weights", default="yolov8m.pt")
+    parser.add_argument("--configs", default="torch,onnx,onnx-int8,openvino,openvino-int8")
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--threads", type=int, default=None)
+    parser.add_argument("--width", type=int, default=640)
+    parser.add_argument("--height", type=int, default=480)
+    args = parser.parse_args()
+
+    clip = read_clip(args.source, args.frames, (args.width, args.height))
+    print(f"{len(clip)} frames from {args.source}, threads={args.threads or 'default'}")
+
+    reference = None
+    print(f"{'config':<15} {'mean':>8} {'p50':>8} {'p95':>8} {'fps':>6}  "
+          f"{'prec':>6} {'recall':>6} {'IoU':>6} {'dconf':>6}")
+    for config in ["torch"] + [c for c in args.configs.split(",") if c and c != "torch"]:
+        backend, int8 = parse_config(config)
+        if backend != "torch" and not os.path.exists(exported_path(args.weights, backend, int8)):
+            print(f"{config:<15} skipped, no export at {exported_path(args.weights, backend, int8)}")
+            continue
+        model = load_model(args.weights, backend, int8=int8, threads=args.threads,
+                           imgsz=max(args.width, args.height))
+        detections, times = run(model, clip)
+        if reference is None:
+            reference = detections
+        score = agreement(reference, detections)
+        print(f"{config:<15} {times.mean() * 1e3:6.1f}ms {np.percentile(times, 50) * 1e3:6.1f}ms "
+              f"{np.percentile(times, 95) * 1e3:6.1f}ms {1 / times.mean():6.1f}  "
+              f"{score['precision']:6.3f} {score['recall']:6.3f} {score['iou']:6.3f} {score['conf']:6.3f}")
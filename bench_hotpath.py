@@ -0,0 +1,298 @@
+"""
+Synthetic benchmark of the per-frame tracking and rendering work of each
+entry point, with a deterministic fake detector in place of YOLO, so it runs
+on any Linux box without a GPU or webcam.
+
+    python bench_hotpath.py
+    python bench_hotpath.py --scenarios obj_v2,server --tracks 8,64 --trail 100,2000 \\
+        --resolutions 1920x1080 --frames 1000 --csv hotpath.csv
+
+Scenarios:
+  obj_v2             resize, extract, draw boxes and trails, blend (obj_v2.run_track)
+  only_black         boxes on a black canvas, trails, blend (object_detection_only_black.py)
+  server             decode a client JPEG at the given resolution, resize, extract,
+                     draw, blend, JPEG encode, pack
+                     (what server_test does for a frame after handle_video_frame)
+  server_detections  decode, resize, extract, pack (detections-only clients)
+
+--excluded sets the share of objects of an excluded class ("person"). Like
+the real detector given classes=allowed_class_ids, the fake detector drops
+them before they are tracked or extracted, except in only_black, which boxes
+them without tracking.
+
+Capture, inference and display are not timed. Each run reports per-frame
+latency percentiles and RSS growth: "growth" is the change over the second
+half of the run, after buffers and pools have reached their working size,
+so anything above noise there is a leak.
+"""
+import argparse
+import csv
+import gc
+import time
+import cv2
+import numpy as np
+from adaptive_encoder import AdaptiveEncoder
+from compositor import TrailCompositor
+from frame_codec import CODEC_DETECTIONS, pack_frame, unpack_frame
+from information import allowed_class_ids, class_color_lut, classNames, excluded_classes
+from memory_monitor import rss_bytes
+from overlay import draw_class_colored, draw_detections, draw_over_black
+from postprocess import class_mask, extract_detections
+from trail_renderer import TrailRenderer
+from trajectory_store import TrajectoryStore
+
+FPS = 30.0  # Frame rate the synthetic clock runs at
+INFERENCE_SIZE = (640, 480)  # What obj_v2 and the server resize frames to
+LINE_INTENSITY = 0.9
+
+
+class FakeBoxes:
+    """Just enough of ultralytics' Boxes for extract_detections."""
+
+    def __init__(self, xyxy, cls, conf, ids):
+        self.xyxy = xyxy
+        self.cls = cls
+        self.conf = conf
+        self.id = ids
+
+    def __len__(self):
+        return len(self.xyxy)
+
+
+class FakeResult:
+    def __init__(self, boxes):
+        self.boxes = boxes
+
+
+class FakeDetector:
+    """
+    Deterministic stand-in for model.track(): `tracks` boxes drifting along
+    smooth paths with stable track IDs. Every `lifetime` frames each object
+    leaves and returns under a new ID (staggered across objects), so track
+    expiry and buffer reuse are exercised as well. A share `excluded` of the
+    objects belongs to an excluded class; given `classes`, only objects of
+    those classes are reported, as with model.track(classes=...).
+    """
+
+    def __init__(self, tracks=8, width=640, height=480, lifetime=300, seed=0, excluded=0.0, classes=None):
+        rng = np.random.default_rng(seed)
+        self.tracks = tracks
+        self.lifetime = lifetime
+        self.frame_size = np.array([width, height], dtype=np.float32)
+        self.phase = rng.uniform(0, 2 * np.pi, (tracks, 2))
+        self.speed = rng.uniform(0.005, 0.03, (tracks, 2))
+        self.half = rng.uniform(0.03, 0.1, (tracks, 2)) * self.frame_size
+        self.offset = rng.integers(0, lifetime, tracks)
+        allowed = np.array(allowed_class_ids)
+        excluded_ids = np.setdiff1d(np.arange(len(classNames)), allowed)
+        self.cls = rng.choice(allowed, tracks).astype(np.float32)
+        self.cls[rng.random(tracks) < excluded] = rng.choice(excluded_ids)
+        self.conf = rng.uniform(0.3, 0.95, tracks).astype(np.float32)
+        self.reported = slice(None) if classes is None else np.isin(self.cls, classes)
+
+    def boxes(self, frame_index):
+        centre = (0.5 + 0.4 * np.sin(self.phase + self.speed * frame_index)) * self.frame_size
+        xyxy = np.hstack([centre - self.half, centre + self.half])
+        return np.clip(xyxy, 0, np.tile(self.frame_size - 1, 2)).astype(np.float32)
+
+    def __call__(self, frame_index):
+        generation = (frame_index + self.offset) // self.lifetime
+        ids = (generation * self.tracks + np.arange(self.tracks) + 1).astype(np.float32)
+        keep = self.reported
+        return [FakeResult(FakeBoxes(self.boxes(frame_index)[keep], self.cls[keep], self.conf[keep], ids[keep]))]
+
+
+class SyntheticFrames:
+    """Camera frames: a fixed textured background with the detector's objects painted on."""
+
+    def __init__(self, width, height, detector, seed=0):
+        rng = np.random.default_rng(seed)
+        gradient = np.linspace(40, 200, width, dtype=np.float32)[None, :, None]
+        noise = rng.normal(0, 12, (height, width, 3))
+        self.background = np.clip(gradient + noise, 0, 255).astype(np.uint8)
+        self.detector = detector
+        self.scale = np.array([width, height] * 2, dtype=np.float32) / np.tile(detector.frame_size, 2)
+
+    def __call__(self, frame_index):
+        img = self.background.copy()
+        for x1, y1, x2, y2 in (self.detector.boxes(frame_index) * self.scale).astype(np.int32).tolist():
+            cv2.rectangle(img, (x1, y1), (x2, y2), (60, 180, 60), -1)
+        return img
+
+
+def scenario_obj_v2(width, height, tracks, trail, lifetime, smooth, excluded):
+    # obj_v2 runs the detector on a 640x480 copy and scales boxes back up
+    detector = FakeDetector(tracks, *INFERENCE_SIZE, lifetime=lifetime, excluded=excluded, classes=allowed_class_ids)
+    scale_x, scale_y = width / INFERENCE_SIZE[0], height / INFERENCE_SIZE[1]
+    trajectories = TrajectoryStore(capacity=trail)
+    renderer = TrailRenderer(smooth=smooth)
+    compositor = TrailCompositor((height, width, 3), LINE_INTENSITY)
+
+    def run(i, img):
+        cv2.resize(img, INFERENCE_SIZE)
+        detections = extract_detections(detector(i), scale_x, scale_y)
+        now = i / FPS
+        trajectories.evict_stale(now)
+        draw_detections(img, compositor, detections, trajectories, renderer, now)
+        return compositor.blend(img)
+
+    return detector, None, run, trajectories
+
+
+def scenario_only_black(width, height, tracks, trail, lifetime, smooth, excluded):
+    # object_detection_only_black.py detects on the full frame and keeps
+    # excluded classes boxed but untracked
+    detector = FakeDetector(tracks, width, height, lifetime=lifetime, excluded=excluded)
+    keep = class_mask(classNames, excluded_classes)
+    trajectories = TrajectoryStore(capacity=trail)
+    renderer = TrailRenderer(smooth=smooth)
+    compositor = TrailCompositor((height, width, 3), LINE_INTENSITY)
+
+    def run(i, img):
+        now = i / FPS
+        trajectories.evict_stale(now)
+        return draw_over_black(compositor, extract_detections(detector(i)), trajectories, renderer, keep, now)
+
+    return detector, None, run, trajectories
+
+
+def _client_frame(i, img):
+    # What a binary-transport client sends; built outside the timed region
+    _, buffer = cv2.imencode('.jpg', img, [cv2.IMWRITE_JPEG_QUALITY, 80])
+    return pack_frame(i, buffer.tobytes(), timestamp=0.0)
+
+
+def _server_decode(data):
+    frame_id, timestamp, _, payload = unpack_frame(data)
+    img = cv2.imdecode(np.frombuffer(payload, np.uint8), cv2.IMREAD_COLOR)
+    return cv2.resize(img, INFERENCE_SIZE), frame_id, timestamp
+
+
+def scenario_server(width, height, tracks, trail, lifetime, smooth, excluded):
+    # server_test.decode_frame, render_frame and send_processed_frame
+    detector = FakeDetector(tracks, *INFERENCE_SIZE, lifetime=lifetime, excluded=excluded, classes=allowed_class_ids)
+    names = dict(enumerate(classNames))
+    trajectories = TrajectoryStore(capacity=trail)
+    renderer = TrailRenderer(smooth=smooth)
+    encoder = AdaptiveEncoder(base_size=INFERENCE_SIZE)
+    compositor = TrailCompositor((INFERENCE_SIZE[1], INFERENCE_SIZE[0], 3), LINE_INTENSITY)
+
+    def run(i, data):
+        resized_img, frame_id, timestamp = _server_decode(data)
+        detections = extract_detections(detector(i))
+        now = i / FPS
+        trajectories.evict_stale(now)
+        draw_class_colored(resized_img, compositor, detections, trajectories, renderer, names, class_color_lut, now)
+        img_encoded, _ = encoder.encode(compositor.blend(resized_img))
+        return pack_frame(frame_id, img_encoded, timestamp=timestamp)
+
+    return detector, _client_frame, run, trajectories
+
+
+def scenario_server_detections(width, height, tracks, trail, lifetime, smooth, excluded):
+    detector = FakeDetector(tracks, *INFERENCE_SIZE, lifetime=lifetime, excluded=excluded, classes=allowed_class_ids)
+
+    def run(i, data):
+        _, frame_id, timestamp = _server_decode(data)
+        detections = extract_detections(detector(i))
+        return pack_frame(frame_id, detections.tobytes(), codec=CODEC_DETECTIONS, timestamp=timestamp)
+
+    return detector, _client_frame, run, None
+
+
+SCENARIOS = {
+    "obj_v2": scenario_obj_v2,
+    "only_black": scenario_only_black,
+    "server": scenario_server,
+    "server_detections": scenario_server_detections,
+}
+
+
+def run_scenario(name, width, height, tracks, trail, frames=600, warmup=30, lifetime=300, smooth=False,
+                 excluded=0.0):
+    """Time `frames` frames of one scenario; returns a dict of latency and memory figures."""
+    detector, prepare, run, trajectories = SCENARIOS[name](width, height, tracks, trail, lifetime, smooth,
+                                                           excluded)
+    camera = SyntheticFrames(width, height, detector)
+    times = np.empty(frames)
+    gc.collect()
+    for i in range(warmup + frames):
+        if i == warmup:
+            rss_start = rss_bytes()
+        elif i == warmup + frames // 2:
+            rss_mid = rss_bytes()
+        data = camera(i)
+        if prepare is not None:
+            data = prepare(i, data)
+        start = time.perf_counter()
+        run(i, data)
+        if i >= warmup:
+            times[i - warmup] = time.perf_counter() - start
+    rss_end = rss_bytes()
+
+    return {
+        "scenario": name, "resolution": f"{width}x{height}", "tracks": tracks, "trail": trail,
+        "mean_ms": times.mean() * 1e3,
+        "p50_ms": np.percentile(times, 50) * 1e3,
+        "p90_ms": np.percentile(times, 90) * 1e3,
+        "p99_ms": np.percentile(times, 99) * 1e3,
+        "max_ms": times.max() * 1e3,
+        "rss_mb": rss_end / 1e6,
+        "total_growth_kb": (rss_end - rss_start) / 1e3,
+        "growth_kb": (rss_end - rss_mid) / 1e3,
+        "trajectories_kb": trajectories.nbytes() / 1e3 if trajectories is not None else 0.0,
+    }
+
+
+def report(row):
+    print(f"{row['scenario']:<18} {row['resolution']:>9} {row['tracks']:>6} {row['trail']:>6}  "
+          f"{row['mean_ms']:7.3f} {row['p50_ms']:7.3f} {row['p90_ms']:7.3f} {row['p99_ms']:7.3f} {row['max_ms']:7.3f}  "
+          f"{row['total_growth_kb']:9.0f} {row['growth_kb']:8.0f} {row['trajectories_kb']:8.0f}")
+
+
+def parse_list(text, convert=int):
+    return [convert(item) for item in text.split(",") if item]
+
+
+def parse_resolution(text):
+    width, height = text.lower().split("x")
+    return int(width), int(height)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--tracks", default="4,16,64", help="objects per frame")
+    parser.add_argument("--trail", default="100,1000", help="points kept per track")
+    parser.add_argument("--resolutions", default="640x480,1920x1080")
+    parser.add_argument("--frames", type=int, default=600)
+    parser.add_argument("--warmup", type=int, default=30)
+    parser.add_argument("--lifetime", type=int, default=300, help="frames before an object returns under a new ID")
+    parser.add_argument("--smooth", action="store_true", help="anti-aliased curved trail segments")
+    parser.add_argument("--excluded", type=float, default=0.0, help="share of objects of an excluded class")
+    parser.add_argument("--csv", help="also write the results to this CSV file")
+    args = parser.parse_args()
+
+    scenarios = parse_list(args.scenarios, str)
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+
+    print(f"{'scenario':<18} {'res':>9} {'tracks':>6} {'trail':>6}  "
+          f"{'mean':>7} {'p50':>7} {'p90':>7} {'p99':>7} {'max':>7}  "
+          f"{'rss+ kB':>9} {'grow kB':>8} {'trajs kB':>8}")
+    rows = []
+    for name in scenarios:
+        for width, height in parse_list(args.resolutions, parse_resolution):
+            for tracks in parse_list(args.tracks):
+                for trail in parse_list(args.trail):
+                    row = run_scenario(name, width, height, tracks, trail, args.frames, args.warmup,
+                                       args.lifetime, args.smooth, args.excluded)
+                    report(row)
+                    rows.append(row)
+
+    if args.csv:
+        with open(args.csv, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+            writer.writeheader()
+            writer.writerows(rows)
@@ -0,0 +1,62 @@
+"""
+Throughput of the pipelined remote-inference client over a high-latency
+link, measured against the local fake_inference_server.
+
+    python bench_remote.py --latency 0.15 --windows 1 4 8 --frames 100
+"""
+import argparse
+import asyncio
+import time
+import cv2
+import numpy as np
+from fake_inference_server import serve
+from remote_inference import RemoteInferenceClient
+
+
+async def measure(url, window, frames, jpeg):
+    client = RemoteInferenceClient(url, window=window)
+    runner = asyncio.create_task(client.run())
+
+    async def produce():
+        for i in range(frames):
+            await client.submit(jpeg, context=i)
+
+    start = time.perf_counter()
+    producer = asyncio.create_task(produce())
+    order = []
+    async for request_id, context, predictions in client.results():
+        order.append(context)
+        if len(order) + client.timed_out >= frames:
+            break
+    elapsed = time.perf_counter() - start
+    await producer
+    await client.close()
+    await runner
+    assert order == sorted(order), "results were released out of order"
+    return frames / elapsed, client
+
+
+async def main(args):
+    server = asyncio.create_task(serve(args.port, args.latency, args.jitter, 3, args.drop_after))
+    await asyncio.sleep(0.2)
+    url = f"ws://localhost:{args.port}"
+    jpeg = cv2.imencode('.jpg', np.zeros((480, 640, 3), np.uint8))[1].tobytes()
+
+    print(f"latency {args.latency * 1e3:.0f} ms +/- {args.jitter * 1e3:.0f} ms, {args.frames} frames")
+    for window in args.windows:
+        fps, client = await measure(url, window, args.frames, jpeg)
+        print(f"window {window:3d}: {fps:7.1f} fps  completed={client.completed} "
+              f"timed out={client.timed_out} reconnects={client.reconnects}")
+    server.cancel()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.15)
+    parser.add_argument("--jitter", type=float, default=0.05)
+    parser.add_argument("--frames", type=int, default=100)
+    parser.add_argument("--windows", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--drop-after", type=int, default=None, help="server closes each connection after N requests")
+    args = parser.parse_args()
+    asyncio.run(main(args))
@@ -0,0 +1,56 @@
+"""
+Bytes and CPU per frame for the base64 text transport versus the binary one.
+
+    python bench_transport.py --frames 500
+"""
+import argparse
+import base64
+import time
+import cv2
+import numpy as np
+from frame_codec import pack_frame, unpack_frame
+
+
+def synthetic_frame(width, height, rng):
+    # Smooth gradient plus noise compresses roughly like a camera image
+    x = np.linspace(0, 255, width, dtype=np.float32)
+    y = np.linspace(0, 255, height, dtype=np.float32)[:, None]
+    img = np.dstack([(x + y) / 2, np.broadcast_to(x, (height, width)), np.broadcast_to(y, (height, width))])
+    img += rng.normal(0, 12, img.shape)
+    return np.clip(img, 0, 255).astype(np.uint8)
+
+
+def time_per_frame(fn, frames):
+    start = time.perf_counter()
+    for i in range(frames):
+        fn(i)
+    return (time.perf_counter() - start) / frames
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--frames", type=int, default=500)
+    parser.add_argument("--width", type=int, default=640)
+    parser.add_argument("--height", type=int, default=480)
+    args = parser.parse_args()
+
+    img = synthetic_frame(args.width, args.height, np.random.default_rng(0))
+    jpeg = cv2.imencode('.jpg', img)[1].tobytes()
+
+    text = base64.b64encode(jpeg).decode('utf-8')
+    binary = pack_frame(0, jpeg)
+
+    def base64_round_trip(i):
+        base64.b64decode(base64.b64encode(jpeg).decode('utf-8'))
+
+    def binary_round_trip(i):
+        bytes(unpack_frame(pack_frame(i, jpeg))[3])
+
+    b64_time = time_per_frame(base64_round_trip, args.frames)
+    bin_time = time_per_frame(binary_round_trip, args.frames)
+
+    print(f"JPEG payload        {len(jpeg):8d} bytes")
+    print(f"base64 text         {len(text):8d} bytes  {b64_time * 1e6:8.1f} us/frame (encode + decode)")
+    print(f"binary with header  {len(binary):8d} bytes  {bin_time * 1e6:8.1f} us/frame (pack + unpack)")
+    print(f"saved per frame     {len(text) - len(binary):8d} bytes ({1 - len(binary) / len(text):.1%}), "
+          f"{(b64_time - bin_time) * 1e6:.1f} us CPU per frame (sender + receiver)")
@@ -0,0 +1,130 @@
+import os
+import threading
+import time
+import zipfile
+import zlib
+import numpy as np
+
+
+class Checkpointer:
+    """
+    Periodic checkpoints of the trail canvas and the trajectories, so a
+    restart or crash loses at most `interval` seconds of trails.
+
+    maybe_save() is called from the frame loop. When a checkpoint is due it
+    takes a snapshot (a copy of the canvas and the store's state(), about a
+    millisecond at 1080p) and hands it to a background thread, which writes
+    it to a temporary file and renames that over `path`, so a crash mid-write
+    leaves the previous checkpoint intact. A checkpoint that is due while the
+    previous one is still being written is skipped, so the loop never waits
+    on the disk. `compress` deflates the canvas at zlib's fastest level (a
+    mostly black canvas shrinks many times over) on the writer thread.
+    """
+
+    def __init__(self, path, interval=5.0, compress=True):
+        self.path = path
+        self.interval = interval
+        self.compress = compress
+        self.saved = 0
+        self.last_duration = None  # seconds the last write took
+        self._last_save = time.monotonic()
+        self._writer = None
+
+    def maybe_save(self, canvas, trajectories):
+        """Start a checkpoint if one is due and none is being written; returns whether it started."""
+        if time.monotonic() - self._last_save < self.interval:
+            return False
+        if self._writer is not None and self._writer.is_alive():
+            return False
+        return self.save(canvas, trajectories)
+
+    def save(self, canvas, trajectories, wait=False):
+        """Snapshot now and write it in the background (or before returning with `wait`)."""
+        self._last_save = time.monotonic()
+        snapshot = dict(trajectories.state(), canvas=canvas.copy(), saved_at=np.float64(time.time()))
+        if self._writer is not None:
+            self._writer.join()
+        self._writer = threading.Thread(target=self._write, args=(snapshot,), daemon=True)
+        self._writer.start()
+        if wait:
+            self._writer.join()
+        return True
+
+    def _write(self, snapshot):
+        start = time.perf_counter()
+        temporary = self.path + ".tmp"
+        try:
+            if self.compress:
+                canvas = snapshot.pop("canvas")
+                snapshot["canvas_shape"] = np.array(canvas.shape)
+                snapshot["canvas_zlib"] = np.frombuffer(zlib.compress(canvas, 1), np.uint8)
+            with open(temporary, "wb") as f:
+                np.savez(f, **snapshot)
+            os.replace(temporary, self.path)
+        except OSError as e:
+            print(f"Checkpoint to {self.path} failed: {e}")
+            return
+        self.saved += 1
+        self.last_duration = time.perf_counter() - start
+
+    def close(self):
+        """Wait for a checkpoint that is still being written."""
+        if self._writer is not None:
+            self._writer.join()
+
+
+def load_checkpoint(path):
+    """
+    The last checkpoint at `path` as a dict of arrays ("canvas" and the
+    TrajectoryStore.state() arrays, with ages including the time since it
+    was written), or None if there is none or it is unreadable.
+    """
+    if not os.path.exists(path):
+        return None
+    try:
+        with np.load(path) as data:
+            checkpoint = {name: data[name] for name in data.files}
+        if "canvas_zlib" in checkpoint:
+            canvas = zlib.decompress(checkpoint.pop("canvas_zlib"))
+            checkpoint["canvas"] = np.frombuffer(canvas, np.uint8).reshape(checkpoint.pop("canvas_shape"))
+        checkpoint["ages"] = checkpoint["ages"] + max(0.0, time.time() - float(checkpoint["saved_at"]))
+    except (OSError, ValueError, EOFError, KeyError, zipfile.BadZipFile, zlib.error) as e:
+        print(f"Ignoring unreadable checkpoint {path}: {e}")
+        return None
+    return checkpoint
+
+
+def reassociate(state, detections, max_distance=80.0):
+    """
+    The tracks of a TrajectoryStore.state() snapshot (e.g. a checkpoint's)
+    that continue in the first tracked `detections` of a new run, renamed
+    to the IDs the new tracker gave them, for TrajectoryStore.restore().
+
+    Each tracked detection takes over the snapshot track whose last point is
+    nearest its centroid, nearest pairs first, if it is within
+    `max_distance` pixels; the other snapshot tracks are left out. Ages
+    restart at zero, as the tracks have just been seen.
+    """
+    tracked = detections[detections["id"] >= 0]
+    ids, counts, points = state["ids"], state["counts"], state["points"]
+    rows, columns = [], []
+    if len(ids) and len(tracked):
+        last = points[np.arange(len(ids)), np.clip(counts, 1, points.shape[1]) - 1].astype(np.float32)
+        centres = np.stack((tracked["cx"], tracked["cy"]), axis=1).astype(np.float32)
+        distance = np.linalg.norm(last[:, None] - centres[None], axis=2)
+        taken_rows, taken_columns = set(), set()
+        for flat in np.argsort(distance, axis=None).tolist():
+            row, column = divmod(flat, len(centres))
+            if distance[row, column] > max_distance:
+                break
+            if row not in taken_rows and column not in taken_columns:
+                taken_rows.add(row)
+                taken_columns.add(column)
+                rows.append(row)
+                columns.append(column)
+    return {
+        "ids": tracked["id"][columns].astype(np.int64),
+        "counts": counts[rows],
+        "ages": np.zeros(len(rows), np.float64),
+        "points": points[rows],
+    }
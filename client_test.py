@@ -5,9 +5,12 @@ import threading
 import socketio
 import sys
 import numpy as np
+from flow_control import FlowControl
+from adaptive_encoder import AdaptiveEncoder
 
 width, height = 640, 480  # Reduced dimensions for transmission
 original_width, original_height = 1920, 1080  # Original dimensions
+link_stats_interval = 1.0  # Seconds between RTT reports to the server
 
 # Create a Socket.IO client
 sio = socketio.Client()
@@ -15,34 +18,51 @@ sio = socketio.Client()
 # Initialize video capture
 cap = cv2.VideoCapture(0)
 
+# Sends the next frame as soon as the server has answered the previous ones
+flow = FlowControl(max_window=4)
+# Picks JPEG quality and transmit resolution from the measured RTT
+encoder = AdaptiveEncoder(base_size=(width, height), name='uplink')
+
+frame_id = 0  # Frames sent on this connection, which is how the server numbers them
+service_time = 0.0  # Server's mean time from receiving a frame to answering it
+
 # Function to send video frames to the server
 def send_frames():
+    global frame_id
+    last_stats = time.perf_counter()
     while True:
+        # Wait until fewer than the allowed number of frames are unanswered
+        flow.acquire()
+
         ret, frame = cap.read()
         if not ret:
             break
 
-        # Resize frame to smaller dimensions before sending
-        frame = cv2.resize(frame, (width, height))
-
-        # Encode the frame as JPEG
-        _, buffer = cv2.imencode('.jpg', frame)
+        # Resize and encode at the quality and resolution the link can sustain
+        buffer, settings = encoder.encode(frame)
         frame_bytes = buffer.tobytes()
         frame_base64 = base64.b64encode(frame_bytes).decode('utf-8')
 
         # Send the frame to the server
+        frame_id += 1
+        flow.sent(frame_id)
         sio.emit('video_frame', frame_base64)
 
-        # Add a small delay to control frame rate
-        time.sleep(0.1)
+        # Let the server adapt its own encoding to the same link, and see ours
+        if flow.srtt is not None and time.perf_counter() - last_stats > link_stats_interval:
+            sio.emit('link_stats', dict(settings, rtt=flow.srtt))
+            last_stats = time.perf_counter()
 
 @sio.event
 def connect():
+    global frame_id
     print('Connected to server')
+    frame_id = 0
 
 @sio.event
 def disconnect():
     print('Disconnected from server')
+    flow.reset()
     cap.release()
     cv2.destroyAllWindows()
     # Instead of sys.exit(), we keep the client running for reconnects
@@ -50,6 +70,9 @@ def disconnect():
 
 @sio.on('processed_frame')
 def on_processed_frame(data):
+    # Replies carry no frame id, but frames the server dropped are reported
+    # separately, so the oldest frame still in flight is the one answered
+    encoder.observe(flow.ack(), service_time=service_time)
     # Decode the base64 image
     img_bytes = base64.b64decode(data)
     np_arr = np.frombuffer(img_bytes, np.uint8)
@@ -64,6 +87,17 @@ def on_processed_frame(data):
     else:
         print("Failed to decode image")
 
+@sio.on('server_stats')
+def on_server_stats(data):
+    # Time the server spends on a frame, which is part of the RTT but not of the link
+    global service_time
+    service_time = data.get('service_time', 0.0)
+
+@sio.on('frame_dropped')
+def on_frame_dropped(data):
+    # Replaced by a newer frame before inference; it will never be answered
+    flow.drop(data.get('frame_id'))
+
 
 if __name__ == '__main__':
     # Connect to the server
@@ -5,70 +5,247 @@ import threading
 import socketio
 import sys
 import numpy as np
+from collections import OrderedDict
+from frame_codec import CODEC_DETECTIONS, pack_frame, unpack_frame
+from information import class_color_lut, classNames
+from postprocess import DETECTION_DTYPE
+from trajectory_store import TrajectoryStore
+from trail_renderer import TrailRenderer
+from compositor import TrailCompositor
+from flow_control import FlowControl
+from adaptive_encoder import AdaptiveEncoder
+from pipeline import LatestQueue, StageStats
 
 width, height = 640, 480  # Resized dimensions for transmission
 original_width, original_height = 1920, 1080  # Original dimensions for display
+response_mode = 'detections'  # 'detections' to draw locally at full resolution, 'frames' for server-drawn JPEGs
+
+# Local compositing for detections mode
+line_thickness = 2
+line_intensity = 0.9
+src_img_intensity = 1
+pending_limit = 30  # Captured frames kept while waiting for their detections
+max_in_flight = 4  # Upper bound on frames sent but not yet answered
+target_rtt = 0.2  # Seconds; JPEG quality and resolution drop while the RTT is above this
+link_stats_interval = 1.0  # Seconds between RTT reports to the server
+hello_timeout = 2.0  # Seconds to wait for the server to answer the hello before sending base64 frames
+display_stats_interval = 10.0  # Seconds between decode/display reports
 
 # Create a Socket.IO client
 sio = socketio.Client()
 
 # Initialize video capture
 cap = cv2.VideoCapture(0)
-display_image = None  # Variable to store the latest processed frame
+binary_transport = False  # Set once the server acknowledges binary frames
+detections_mode = False  # Set once the server agrees to send detections only
+server_size = (width, height)  # Frame size the server's boxes refer to
+service_time = 0.0  # Server's mean time from receiving a frame to answering it
+hello_answered = threading.Event()  # Set once the transport and response mode are settled
+
+pending_frames = OrderedDict()  # frame id -> full-resolution captured frame
+pending_lock = threading.Lock()
+trajectories = TrajectoryStore()
+renderer = TrailRenderer(thickness=line_thickness)
+compositor = None  # Trail canvas, created at the first frame's size
+
+# Received payloads wait for the decode thread, decoded frames for the display
+# loop. Every detection payload is drawn, in order, so trails have no gaps;
+# a JPEG frame is skipped when a newer payload is waiting, and the display
+# takes only the newest frame, so a slow stage skips frames rather than
+# falling behind
+incoming = LatestQueue(maxsize=pending_limit)
+decoded = LatestQueue()
+skipped_frames = 0  # JPEG frames skipped for a newer one before decoding
+decode_stats = StageStats()
+
+# Sends the next frame as soon as the server has capacity for it
+flow = FlowControl(max_window=max_in_flight)
+# Picks JPEG quality and transmit resolution from the measured RTT
+encoder = AdaptiveEncoder(base_size=(width, height), target_rtt=target_rtt, name='uplink')
 
 # Function to send video frames to the server
 def send_frames():
+    frame_id = 0
+    last_stats = time.perf_counter()
     while True:
+        # Frames sent before the hello is answered would carry no id for the
+        # agreed mode to answer; a server that never answers gets base64
+        if not hello_answered.wait(hello_timeout):
+            hello_answered.set()
+
+        # Wait until fewer than the allowed number of frames are unanswered
+        flow.acquire()
+
         ret, frame = cap.read()
         if not ret:
             break
+        frame_id += 1
 
-        # Resize frame to smaller dimensions before sending
-        frame = cv2.resize(frame, (width, height))
+        # Keep the full-resolution frame to draw the server's detections on
+        if detections_mode:
+            with pending_lock:
+                pending_frames[frame_id] = frame
+                while len(pending_frames) > pending_limit:
+                    pending_frames.popitem(last=False)
 
-        # Encode the frame as JPEG
-        _, buffer = cv2.imencode('.jpg', frame)
-        frame_bytes = buffer.tobytes()
-        frame_base64 = base64.b64encode(frame_bytes).decode('utf-8')
+        # Resize and encode at the quality and resolution the link can sustain
+        buffer, settings = encoder.encode(frame)
 
-        # Send the frame to the server
-        sio.emit('video_frame', frame_base64)
+        # Send the frame to the server, as raw bytes if it supports them
+        flow.sent(frame_id)
+        if binary_transport:
+            sio.emit('video_frame', pack_frame(frame_id, buffer))
+        else:
+            frame_base64 = base64.b64encode(buffer.tobytes()).decode('utf-8')
+            sio.emit('video_frame', frame_base64)
 
-        # Add a small delay to control frame rate
-        time.sleep(0.1)
+        # Let the server adapt its own encoding to the same link, and see ours
+        if flow.srtt is not None and time.perf_counter() - last_stats > link_stats_interval:
+            sio.emit('link_stats', dict(settings, rtt=flow.srtt))
+            last_stats = time.perf_counter()
 
 @sio.event
 def connect():
     print('Connected to server')
+    hello_answered.clear()
+    # Ask for binary frames; servers without support never acknowledge and
+    # the base64 transport stays in use
+    sio.emit('hello', {'transport': 'binary', 'mode': response_mode})
+
+@sio.on('hello_ack')
+def on_hello_ack(data):
+    global binary_transport, detections_mode, server_size
+    binary_transport = data.get('transport') == 'binary'
+    detections_mode = data.get('mode') == 'detections'
+    server_size = (data.get('width', width), data.get('height', height))
+    print(f"Using {'binary' if binary_transport else 'base64'} frame transport, "
+          f"{'detections' if detections_mode else 'frames'} responses")
+    hello_answered.set()
 
 @sio.event
 def disconnect():
+    global binary_transport, detections_mode
     print('Disconnected from server')
+    binary_transport = detections_mode = False
+    flow.reset()
     cap.release()
     cv2.destroyAllWindows()
 
 @sio.on('processed_frame')
 def on_processed_frame(data):
-    global display_image
-    # Decode the base64 image
-    img_bytes = base64.b64decode(data)
+    # Only acknowledge here; decoding happens on the decode thread so the
+    # Socket.IO callback thread is never blocked
+    if isinstance(data, (bytes, bytearray)):
+        try:
+            frame_id = unpack_frame(data)[0]
+        except ValueError as e:
+            print(f"Received malformed frame: {e}")
+            return
+        encoder.observe(flow.ack(frame_id), service_time=service_time)
+    else:
+        encoder.observe(flow.ack(), service_time=service_time)
+    incoming.put(data)
+
+@sio.on('server_stats')
+def on_server_stats(data):
+    # Time the server spends on a frame, which is part of the RTT but not of the link
+    global service_time
+    service_time = data.get('service_time', 0.0)
+
+@sio.on('frame_dropped')
+def on_frame_dropped(data):
+    # Replaced by a newer frame before inference; it will never be answered
+    flow.drop(data.get('frame_id'))
+
+def decode_frames():
+    global skipped_frames
+    while True:
+        data = incoming.get()
+        if data is None:
+            break
+        if not detections_mode and len(incoming):
+            skipped_frames += 1
+            continue
+        start = time.perf_counter()
+        img = decode_processed_frame(data)
+        if img is not None:
+            decoded.put(img)
+        decode_stats.add('decode', time.perf_counter() - start)
+
+def decode_processed_frame(data):
+    # Binary frames carry a header; legacy servers send base64 text
+    if isinstance(data, (bytes, bytearray)):
+        frame_id, _, codec, img_bytes = unpack_frame(data)
+        if codec == CODEC_DETECTIONS:
+            return on_detections(frame_id, img_bytes)
+    else:
+        img_bytes = base64.b64decode(data)
     np_arr = np.frombuffer(img_bytes, np.uint8)
     img = cv2.imdecode(np_arr, cv2.IMREAD_COLOR)
 
-    if img is not None:
-        # Resize frame back to original dimensions for display
-        display_image = cv2.resize(img, (original_width, original_height))
-    else:
+    if img is None:
         print("Failed to decode image")
+        return None
+    # Resize frame back to original dimensions for display
+    return cv2.resize(img, (original_width, original_height))
+
+def on_detections(frame_id, payload):
+    with pending_lock:
+        frame = pending_frames.pop(frame_id, None)
+        # Frames older than this one will never be answered
+        while pending_frames and next(iter(pending_frames)) < frame_id:
+            pending_frames.popitem(last=False)
+    if frame is None or len(payload) % DETECTION_DTYPE.itemsize:
+        return None
+    detections = np.frombuffer(payload, DETECTION_DTYPE)
+    return composite_detections(frame, detections)
+
+def composite_detections(frame, detections):
+    global compositor
+    if compositor is None or compositor.shape != frame.shape:
+        compositor = TrailCompositor(frame.shape, line_intensity, src_img_intensity)
+    trajectories.evict_stale()
+
+    # Boxes arrive in the server's inference resolution
+    scale_x = frame.shape[1] / server_size[0]
+    scale_y = frame.shape[0] / server_size[1]
+
+    colors = class_color_lut[detections["cls"]].tolist()
+    for (x1, y1, x2, y2, cx, cy, cls, conf, track_id), color in zip(detections.tolist(), colors):
+        x1, y1, x2, y2 = int(x1 * scale_x), int(y1 * scale_y), int(x2 * scale_x), int(y2 * scale_y)
+        class_name = classNames[cls]
+
+        if track_id >= 0:
+            trajectories.append(track_id, (int(cx * scale_x), int(cy * scale_y)))
+            compositor.draw(renderer, trajectories.tail(track_id, 3), color)
+
+        cv2.rectangle(frame, (x1, y1), (x2, y2), color, 2)
+        cv2.putText(frame, f'{class_name} {round(conf, 2)}', (x1, y1 - 10),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 1)
+
+    return compositor.blend(frame)
 
 def display_processed_frames():
-    global display_image
+    shown = 0
+    last_report = time.perf_counter()
     while True:
-        if display_image is not None:
-            cv2.imshow('Processed Video', display_image)
+        # Block until a new frame is decoded; the short timeout keeps the
+        # window responsive to the quit key
+        img = decoded.get(timeout=0.05)
+        if img is not None:
+            cv2.imshow('Processed Video', img)
+            shown += 1
         if cv2.waitKey(1) & 0xFF == ord('q'):
             sio.disconnect()
             break
+
+        now = time.perf_counter()
+        if now - last_report > display_stats_interval:
+            print(f"[display] fps={shown / (now - last_report):.1f} {decode_stats.summary()} "
+                  f"skipped before decode={incoming.dropped + skipped_frames} before display={decoded.dropped}")
+            shown = 0
+            last_report = now
+    incoming.close()
     cv2.destroyAllWindows()
 
 if __name__ == '__main__':
@@ -79,6 +256,9 @@ if __name__ == '__main__':
     thread = threading.Thread(target=send_frames)
     thread.start()
 
+    # Decode and composite processed frames off the Socket.IO callback thread
+    threading.Thread(target=decode_frames, daemon=True).start()
+
     # Start the display loop for processed frames
     display_processed_frames()
 
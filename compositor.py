@@ -0,0 +1,121 @@
+import cv2
+import numpy as np
+
+
+class TrailCompositor:
+    """
+    Owns a persistent trail canvas and overlays it onto frames, touching only
+    the parts of the frame that have trail pixels under them.
+
+    Draw trails with draw(renderer, points, color) (or draw on `canvas`
+    directly and pass the touched rectangle to mark()). The canvas is split
+    into `tile`-sized tiles and every tile a segment touches is marked; since
+    a black canvas pixel leaves the frame unchanged when src_intensity is 1,
+    blend() only runs addWeighted, in place, over the marked tiles (merged
+    into one rectangle per run of tile rows with the same extent).
+
+    over_black() serves the black-background view: the frame is all zero
+    there, so the blend reduces to a copy of the canvas pre-scaled by
+    line_intensity, which is kept up to date for marked tiles only.
+    """
+
+    def __init__(self, shape, line_intensity=0.9, src_intensity=1.0, tile=64):
+        self.line_intensity = line_intensity
+        self.src_intensity = src_intensity
+        self.tile = tile
+        self.canvas = np.zeros(shape, np.uint8)
+        self._height, self._width = shape[:2]
+        grid = (-(-self._height // tile), -(-self._width // tile))
+        self._tiles = np.zeros(grid, bool)  # tiles with trail pixels
+        self._unscaled = np.zeros(grid, bool)  # tiles changed since the last over_black()
+        self._spans = []
+        self._spans_valid = True
+        self._scaled = None
+        self._output = None
+
+    @property
+    def shape(self):
+        return self.canvas.shape
+
+    def mark(self, rect):
+        """Record that the (x, y, w, h) rectangle of the canvas was drawn on."""
+        if rect is None:
+            return
+        x, y, w, h = rect
+        x0, y0 = max(x, 0) // self.tile, max(y, 0) // self.tile
+        x1 = (min(x + w, self._width) - 1) // self.tile
+        y1 = (min(y + h, self._height) - 1) // self.tile
+        if x1 < x0 or y1 < y0:
+            return
+        self._tiles[y0:y1 + 1, x0:x1 + 1] = True
+        self._unscaled[y0:y1 + 1, x0:x1 + 1] = True
+        self._spans_valid = False
+
+    def draw(self, renderer, points, color):
+        self.mark(renderer.draw(self.canvas, points, color))
+
+    def _rects(self, tiles):
+        # One rectangle per run of tile rows whose marked tiles span the same columns
+        rects = []
+        for row in np.flatnonzero(tiles.any(axis=1)):
+            cols = np.flatnonzero(tiles[row])
+            x0, x1 = cols[0] * self.tile, min((cols[-1] + 1) * self.tile, self._width)
+            y0, y1 = row * self.tile, min((row + 1) * self.tile, self._height)
+            if rects and rects[-1][2] == x0 and rects[-1][3] == x1 and rects[-1][1] == y0:
+                rects[-1][1] = y1
+            else:
+                rects.append([y0, y1, x0, x1])
+        return rects
+
+    def blend(self, img):
+        """Overlay the trails onto `img` in place and return it."""
+        if self.src_intensity != 1.0:
+            # Every pixel is scaled, so the whole frame has to be blended
+            return cv2.addWeighted(img, self.src_intensity, self.canvas, self.line_intensity, 0, dst=img)
+        if not self._spans_valid:
+            self._spans = self._rects(self._tiles)
+            self._spans_valid = True
+        for y0, y1, x0, x1 in self._spans:
+            roi = img[y0:y1, x0:x1]
+            cv2.addWeighted(roi, 1.0, self.canvas[y0:y1, x0:x1], self.line_intensity, 0, dst=roi)
+        return img
+
+    def over_black(self):
+        """
+        The trails on a black background, in a buffer reused on every call;
+        draw boxes and labels onto it afterwards.
+        """
+        if self._output is None:
+            self._output = np.zeros_like(self.canvas)
+        if self.line_intensity == 1.0:
+            np.copyto(self._output, self.canvas)
+            return self._output
+
+        if self._scaled is None:
+            self._scaled = np.zeros_like(self.canvas)
+        for y0, y1, x0, x1 in self._rects(self._unscaled):
+            cv2.convertScaleAbs(self.canvas[y0:y1, x0:x1], dst=self._scaled[y0:y1, x0:x1], alpha=self.line_intensity)
+        self._unscaled[:] = False
+        np.copyto(self._output, self._scaled)
+        return self._output
+
+    def load(self, canvas):
+        """Replace the canvas, e.g. with a checkpoint; only tiles with trail pixels get marked."""
+        np.copyto(self.canvas, canvas)
+        grid_h, grid_w = self._tiles.shape
+        occupied = np.zeros((grid_h * self.tile, grid_w * self.tile), bool)
+        occupied[:self._height, :self._width] = canvas.any(axis=2)
+        self._tiles[:] = occupied.reshape(grid_h, self.tile, grid_w, self.tile).any(axis=(1, 3))
+        self._unscaled[:] = True
+        self._spans_valid = False
+
+    def clear(self):
+        self.canvas[:] = 0
+        if self._scaled is not None:
+            self._scaled[:] = 0
+        self._tiles[:] = False
+        self._unscaled[:] = False
+        self._spans = []
+
+    def nbytes(self):
+        return sum(buffer.nbytes for buffer in (self.canvas, self._scaled, self._output) if buffer is not None)
@@ -0,0 +1,310 @@
+"""
+Detector backends for CPU boxes: PyTorch, or a model exported to ONNX Runtime
+or OpenVINO, optionally INT8-quantized. Exported models are loaded through
+ultralytics, so model.track() and model.predict() work unchanged.
+
+Export once, next to the weights:
+
+    python detector_backend.py yolov8m.pt --backend onnx
+    python detector_backend.py yolov8m.pt --backend onnx --int8 --calibration clip.mp4
+    python detector_backend.py yolov8m.pt --backend openvino --int8
+    python detector_backend.py yolov8l.pt --backend onnx --dynamic  # batched predict (server_test, batch_process)
+
+then choose it in information.detector_options, which every entry point
+loads its detector with. Its auto_export (on by default) builds a missing or
+stale export on first start instead, and later starts load it from disk.
+"""
+import argparse
+import glob
+import os
+import threading
+import time
+import cv2
+import numpy as np
+try:
+    from ultralytics import YOLO
+except ImportError:  # BACKENDS and exported_path() still serve callers without a model, e.g. synthetic runs
+    YOLO = None
+from metrics import process_uptime
+
+BACKENDS = ("torch", "onnx", "openvino")
+
+
+def exported_path(weights, backend, int8=False):
+    """Where the export of `weights` for `backend` lives (next to the weights)."""
+    stem = os.path.splitext(weights)[0] + ("_int8" if int8 else "")
+    if backend == "onnx":
+        return stem + ".onnx"
+    if backend == "openvino":
+        return stem + "_openvino_model"
+    return weights
+
+
+def _export_current(path, weights):
+    # An export older than its weights is stale
+    if not os.path.exists(path):
+        return False
+    return not os.path.exists(weights) or os.path.getmtime(path) >= os.path.getmtime(weights)
+
+
+def _fixed_batch(path, backend):
+    # The batch size an export's input is fixed to, or None if it takes any
+    if backend == "onnx":
+        import onnx
+        dim = onnx.load(path, load_external_data=False).graph.input[0].type.tensor_type.shape.dim[0]
+        return dim.dim_value if dim.HasField("dim_value") else None
+    import openvino as ov
+    xml = next(glob.iglob(os.path.join(path, "*.xml")))
+    batch = ov.Core().read_model(xml).inputs[0].get_partial_shape()[0]
+    return None if batch.is_dynamic else batch.get_length()
+
+
+def _export_usable(path, weights, backend, dynamic):
+    # Current, and taking batches of any size if they are needed
+    return _export_current(path, weights) and not (dynamic and _fixed_batch(path, backend))
+
+
+def prepare_export(weights, backend, int8=False, imgsz=640, dynamic=False):
+    """Build the export load_model() would use if it is missing, stale or of a fixed batch size."""
+    path = exported_path(weights, backend, int8)
+    if backend != "torch" and not _export_usable(path, weights, backend, dynamic):
+        print(f"Exporting {weights} for {backend}{' (int8)' if int8 else ''}; later starts reuse {path}")
+        export_model(weights, backend, int8, imgsz, dynamic=dynamic)
+    return path
+
+
+def load_model(weights="yolov8m.pt", backend="torch", int8=False, threads=None, imgsz=640,
+               auto_export=False, dynamic=False):
+    """
+    A YOLO model on the requested backend. A missing or stale export is built
+    first with `auto_export` (once; later starts reuse it), otherwise the
+    PyTorch weights are used instead. With `dynamic` the model has to take
+    batches of any size; an export with a fixed batch size is rebuilt or,
+    without `auto_export`, passed over for PyTorch as well. `threads` caps
+    the CPU threads used for inference (None keeps the runtime's default).
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"unknown detector backend {backend!r}, expected one of {', '.join(BACKENDS)}")
+
+    path = exported_path(weights, backend, int8)
+    flags = f"--backend {backend}{' --int8' if int8 else ''}{' --dynamic' if dynamic else ''}"
+    if auto_export:
+        prepare_export(weights, backend, int8, imgsz, dynamic)
+    if backend != "torch" and not os.path.exists(path):
+        print(f"No {backend} export at {path}, falling back to PyTorch "
+              f"(python detector_backend.py {weights} {flags})")
+        backend, path = "torch", weights
+    elif backend != "torch" and dynamic and _fixed_batch(path, backend):
+        # A batched predict() on it would fail on every batch of another size
+        print(f"{path} takes a fixed batch size, falling back to PyTorch "
+              f"(python detector_backend.py {weights} {flags})")
+        backend, path = "torch", weights
+
+    if backend == "torch":
+        model = YOLO(path)
+        if threads:
+            import torch
+            torch.set_num_threads(threads)
+        return model
+
+    model = YOLO(path, task="detect")
+    if threads:
+        # The runtime session only exists once the predictor is set up
+        model.predict(np.zeros((imgsz, imgsz, 3), np.uint8), imgsz=imgsz, verbose=False)
+        _set_runtime_threads(model, threads)
+    print(f"Detector: {path} ({backend}{', int8' if int8 else ''})")
+    return model
+
+
+def _set_runtime_threads(model, threads):
+    # ultralytics builds its ONNX Runtime session / OpenVINO compiled model
+    # with default threading; rebuild them with the thread count applied.
+    # AutoBackend keeps every local of its __init__ as an attribute; these
+    # are the ones ultralytics 8.2.97 sets (w: model path, core / ov_model:
+    # what ov_compiled_model was compiled from), so check they are all there
+    runtime = getattr(getattr(model, "predictor", None), "model", None)
+    try:
+        if getattr(runtime, "onnx", False) and all(hasattr(runtime, a) for a in ("session", "w")):
+            import onnxruntime
+            options = onnxruntime.SessionOptions()
+            options.intra_op_num_threads = threads
+            runtime.session = onnxruntime.InferenceSession(str(runtime.w), options,
+                                                           providers=runtime.session.get_providers())
+            return
+        if getattr(runtime, "xml", False) and all(hasattr(runtime, a) for a in ("core", "ov_model", "ov_compiled_model")):
+            runtime.ov_compiled_model = runtime.core.compile_model(
+                runtime.ov_model, device_name="CPU",
+                config={"PERFORMANCE_HINT": getattr(runtime, "inference_mode", "LATENCY"),
+                        "INFERENCE_NUM_THREADS": threads})
+            return
+    except Exception as e:  # keep the working session ultralytics built
+        print(f"Setting the detector thread count failed: {e}")
+    print(f"Could not set the detector thread count to {threads}; using the runtime default")
+
+
+class LazyModel:
+    """
+    Stand-in for a YOLO model that creates it on first use, or in the
+    background once preload() is called, and runs a warm-up inference on a
+    blank `warmup_size` frame before handing it out, so the first real frame
+    does not pay for lazy setup. Attribute access (model.track, model.predict,
+    model.names, ...) waits for the load, so it can replace YOLO(...) at
+    module level. `on_load(model)` runs once the model is ready, and
+    `ready_uptime` records how long after process start that was.
+    """
+
+    def __init__(self, weights="yolov8m.pt", backend="torch", int8=False, threads=None,
+                 warmup_size=(640, 480), auto_export=False, dynamic=False, on_load=None):
+        self.weights = weights
+        self.backend = backend
+        self.int8 = int8
+        self.threads = threads
+        self.warmup_size = warmup_size
+        self.auto_export = auto_export
+        self.dynamic = dynamic
+        self.on_load = on_load
+        self.load_time = None
+        self.warmup_time = None
+        self.ready_uptime = None  # process_uptime() once loaded and warmed up
+        self._model = None
+        self._lock = threading.Lock()
+
+    def preload(self):
+        """Start loading on a background thread, e.g. while the camera opens."""
+        threading.Thread(target=self._preload, daemon=True).start()
+        return self
+
+    def _preload(self):
+        try:
+            self.load()
+        except Exception as e:  # load() raises again on first use
+            print(f"Detector preload failed: {e}")
+
+    def load(self):
+        if self._model is not None:
+            return self._model
+        with self._lock:
+            if self._model is None:
+                start = time.perf_counter()
+                model = load_model(self.weights, self.backend, self.int8, self.threads,
+                                   imgsz=max(self.warmup_size), auto_export=self.auto_export, dynamic=self.dynamic)
+                loaded = time.perf_counter()
+                width, height = self.warmup_size
+                model.predict(np.zeros((height, width, 3), np.uint8), verbose=False)
+                self.load_time, self.warmup_time = loaded - start, time.perf_counter() - loaded
+                print(f"Detector ready: loaded in {self.load_time:.2f} s, warm-up {self.warmup_time:.2f} s")
+                if self.on_load is not None:
+                    self.on_load(model)
+                self.ready_uptime = process_uptime()
+                self._model = model
+        return self._model
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return getattr(self.load(), name)
+
+
+def letterbox(img, size=640):
+    """Resize keeping the aspect ratio and pad to size x size, as ultralytics does."""
+    h, w = img.shape[:2]
+    scale = min(size / h, size / w)
+    resized = cv2.resize(img, (round(w * scale), round(h * scale)), interpolation=cv2.INTER_LINEAR)
+    out = np.full((size, size, 3), 114, np.uint8)
+    top, left = (size - resized.shape[0]) // 2, (size - resized.shape[1]) // 2
+    out[top:top + resized.shape[0], left:left + resized.shape[1]] = resized
+    return out
+
+
+def calibration_frames(source, count=100, size=640):
+    """Up to `count` frames spread over a video, preprocessed as the exported model's input."""
+    cap = cv2.VideoCapture(source)
+    total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT)) or count
+    step = max(1, total // count)
+    frames = []
+    index = 0
+    while len(frames) < count:
+        success, img = cap.read()
+        if not success:
+            break
+        if index % step == 0:
+            rgb = cv2.cvtColor(letterbox(img, size), cv2.COLOR_BGR2RGB)
+            frames.append(np.ascontiguousarray(rgb.transpose(2, 0, 1)[None], dtype=np.float32) / 255.0)
+        index += 1
+    cap.release()
+    return frames
+
+
+def quantize_onnx(fp32_path, int8_path, calibration=None, size=640):
+    """
+    INT8 copy of an ONNX model: static quantization calibrated on frames of a
+    recorded clip if one is given, dynamic (weights only) otherwise.
+    """
+    from onnxruntime.quantization import CalibrationDataReader, QuantFormat, QuantType, \
+        quantize_dynamic, quantize_static
+
+    if calibration is None:
+        quantize_dynamic(fp32_path, int8_path, weight_type=QuantType.QUInt8)
+        return _copy_metadata(fp32_path, int8_path)
+
+    class ClipReader(CalibrationDataReader):
+        def __init__(self, frames, input_name):
+            self._inputs = iter({input_name: frame} for frame in frames)
+
+        def get_next(self):
+            return next(self._inputs, None)
+
+    import onnxruntime
+    input_name = onnxruntime.InferenceSession(fp32_path, providers=["CPUExecutionProvider"]).get_inputs()[0].name
+    frames = calibration_frames(calibration, size=size)
+    if not frames:
+        raise ValueError(f"no frames could be read from {calibration}")
+    quantize_static(fp32_path, int8_path, ClipReader(frames, input_name), quant_format=QuantFormat.QDQ,
+                    activation_type=QuantType.QUInt8, weight_type=QuantType.QInt8)
+    return _copy_metadata(fp32_path, int8_path)
+
+
+def _copy_metadata(source, target):
+    # ultralytics reads class names, stride and image size from the metadata
+    import onnx
+    model = onnx.load(target)
+    if not model.metadata_props:
+        model.metadata_props.extend(onnx.load(source, load_external_data=False).metadata_props)
+        onnx.save(model, target)
+    return target
+
+
+def export_model(weights, backend="onnx", int8=False, imgsz=640, calibration=None, data="coco8.yaml",
+                 dynamic=False):
+    """
+    Export `weights` for `backend` to exported_path(); returns that path.
+    `dynamic` allows any batch size, which batched predict() calls need.
+    """
+    model = YOLO(weights)
+    target = exported_path(weights, backend, int8)
+    if backend == "onnx":
+        fp32 = model.export(format="onnx", imgsz=imgsz, simplify=True, dynamic=dynamic)
+        if not int8:
+            return fp32
+        return quantize_onnx(fp32, target, calibration, imgsz)
+    if backend == "openvino":
+        # NNCF calibrates INT8 on the `data` dataset
+        exported = model.export(format="openvino", imgsz=imgsz, int8=int8, data=data, dynamic=dynamic)
+        if os.path.normpath(exported) != os.path.normpath(target):
+            os.replace(exported, target)
+        return target
+    raise ValueError(f"nothing to export for backend {backend!r}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("weights")
+    parser.add_argument("--backend", choices=BACKENDS[1:], default="onnx")
+    parser.add_argument("--int8", action="store_true")
+    parser.add_argument("--imgsz", type=int, default=640)
+    parser.add_argument("--calibration", help="video to calibrate ONNX INT8 activations on")
+    parser.add_argument("--data", default="coco8.yaml", help="dataset for OpenVINO INT8 calibration")
+    parser.add_argument("--dynamic", action="store_true", help="allow any batch size")
+    args = parser.parse_args()
+    path = export_model(args.weights, args.backend, args.int8, args.imgsz, args.calibration, args.data, args.dynamic)
+    print(f"Exported to {path}")
@@ -0,0 +1,70 @@
+"""
+Local stand-in for the remote inference endpoint used by obj_v3.py.
+
+Answers every request after a configurable latency (with jitter, so replies
+can overtake each other) with synthetic predictions: a few boxes with stable
+IDs moving across a 640x480 frame.
+
+    python fake_inference_server.py --port 8765 --latency 0.15 --jitter 0.05
+"""
+import argparse
+import asyncio
+import json
+import math
+import random
+import websockets
+
+
+def synthetic_predictions(request_id, objects=3, width=640, height=480):
+    predictions = []
+    for i in range(objects):
+        t = request_id * 0.05 + i * 2.0
+        cx = width / 2 + math.cos(t) * width * 0.35
+        cy = height / 2 + math.sin(1.3 * t) * height * 0.35
+        predictions.append({
+            "id": i + 1,
+            "class": 2 + i,  # skip "person", which obj_v3.py excludes
+            "confidence": 0.9,
+            "bbox": [cx - 30, cy - 20, cx + 30, cy + 20],
+        })
+    return predictions
+
+
+async def serve(port, latency, jitter, objects, drop_after=None):
+    async def handle(ws):
+        received = 0
+
+        async def answer(message):
+            request = json.loads(message)
+            await asyncio.sleep(max(0.0, latency + random.uniform(-jitter, jitter)))
+            reply = {"id": request["id"], "predictions": synthetic_predictions(request["id"], objects)}
+            try:
+                await ws.send(json.dumps(reply))
+            except websockets.ConnectionClosed:
+                pass
+
+        # Requests are answered concurrently, like a server with several workers
+        tasks = set()
+        async for message in ws:
+            received += 1
+            if drop_after is not None and received > drop_after:
+                # Simulate a dropped link; the client has to reconnect and resume
+                await ws.close()
+                return
+            task = asyncio.create_task(answer(message))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+
+    async with websockets.serve(handle, "localhost", port, max_size=None):
+        await asyncio.Future()  # run until cancelled
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.15, help="seconds per request")
+    parser.add_argument("--jitter", type=float, default=0.05)
+    parser.add_argument("--objects", type=int, default=3)
+    parser.add_argument("--drop-after", type=int, default=None, help="close each connection after N requests")
+    args = parser.parse_args()
+    asyncio.run(serve(args.port, args.latency, args.jitter, args.objects, args.drop_after))
@@ -0,0 +1,142 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class FlowControl:
+    """
+    Credit-based flow control for a frame-sending client.
+
+    At most `window` frames may be unacknowledged; acquire() blocks until a
+    credit is free. The window adapts to the measured round-trip time: it grows
+    by one frame per window of acknowledgements while the RTT stays near the
+    best seen, and shrinks when the RTT rises well above it or the server
+    drops frames (either way they are queueing somewhere). Sends are paced
+    evenly over the RTT. An ack for frame N also releases every older frame,
+    since the server drops superseded frames without answering them; drop()
+    releases a frame the server reports dropping, and frames unanswered for
+    `ack_timeout` seconds are given up on. Each of these losses shrinks the
+    window.
+    """
+
+    def __init__(self, max_window=4, min_window=1, ack_timeout=2.0, report_interval=10.0):
+        self.max_window = max_window
+        self.min_window = min_window
+        self.ack_timeout = ack_timeout
+        self.report_interval = report_interval
+        self.window = float(min_window)
+        self.srtt = None  # smoothed round-trip time
+        self.min_rtt = None
+        self.lost = 0
+        self._in_flight = OrderedDict()  # frame id -> send time
+        self._last_sent = 0.0
+        self._cond = threading.Condition()
+        self._acked = 0
+        self._rtt_sum = 0.0
+        self._last_report = time.perf_counter()
+
+    def in_flight(self):
+        return len(self._in_flight)
+
+    def acquire(self, timeout=None):
+        """Wait for a free credit; False on timeout."""
+        deadline = None if timeout is None else time.perf_counter() + timeout
+        with self._cond:
+            while len(self._in_flight) >= int(self.window):
+                self._expire()
+                if len(self._in_flight) < int(self.window):
+                    break
+                remaining = 0.1 if deadline is None else min(0.1, deadline - time.perf_counter())
+                if remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+            # Spread the window over one RTT rather than sending it as a burst
+            # the server would mostly drop
+            pause = 0.0 if self.srtt is None else self._last_sent + self.srtt / self.window - time.perf_counter()
+        if pause > 0:
+            time.sleep(pause)
+        return True
+
+    def sent(self, frame_id):
+        with self._cond:
+            self._last_sent = time.perf_counter()
+            self._in_flight[frame_id] = self._last_sent
+
+    def ack(self, frame_id=None):
+        """
+        Record the server's answer to `frame_id` (the oldest frame in flight if
+        the server does not echo ids) and return its round-trip time.
+        """
+        now = time.perf_counter()
+        with self._cond:
+            if not self._in_flight:
+                return None
+            if frame_id is None:
+                frame_id = next(iter(self._in_flight))
+            sent_at = self._in_flight.pop(frame_id, None)
+            if sent_at is None:
+                return None
+            # Older frames were superseded on the server and will not be answered
+            superseded = 0
+            while self._in_flight and next(iter(self._in_flight)) < frame_id:
+                self._in_flight.popitem(last=False)
+                superseded += 1
+            self.lost += superseded
+
+            rtt = now - sent_at
+            self._adapt(rtt, superseded)
+            self._acked += 1
+            self._rtt_sum += rtt
+            self._cond.notify_all()
+
+        if now - self._last_report > self.report_interval:
+            self.report(now)
+        return rtt
+
+    def _adapt(self, rtt, superseded):
+        self.srtt = rtt if self.srtt is None else 0.875 * self.srtt + 0.125 * rtt
+        self.min_rtt = rtt if self.min_rtt is None else min(self.min_rtt, rtt)
+        # Dropped frames mean the server is already saturated
+        if superseded or self.srtt > 2.0 * self.min_rtt:
+            self._shrink()
+        elif self.srtt < 1.25 * self.min_rtt:
+            self.window = min(self.max_window, self.window + 1.0 / self.window)
+
+    def drop(self, frame_id):
+        """Give up on `frame_id`, which the server dropped without answering."""
+        with self._cond:
+            if self._in_flight.pop(frame_id, None) is None:
+                return
+            self.lost += 1
+            self._shrink()
+            self._cond.notify_all()
+
+    def _shrink(self):
+        self.window = max(self.min_window, self.window * 0.75)
+
+    def _expire(self):
+        cutoff = time.perf_counter() - self.ack_timeout
+        expired = 0
+        while self._in_flight and next(iter(self._in_flight.values())) < cutoff:
+            self._in_flight.popitem(last=False)
+            expired += 1
+        # Frames lost without an answer are a sign of overload like any other
+        if expired:
+            self.lost += expired
+            self._shrink()
+
+    def reset(self):
+        """Forget frames in flight, e.g. after a reconnect."""
+        with self._cond:
+            self._in_flight.clear()
+            self._cond.notify_all()
+
+    def report(self, now=None):
+        now = time.perf_counter() if now is None else now
+        elapsed = now - self._last_report
+        if self._acked:
+            print(f"[flow] fps={self._acked / elapsed:.1f} rtt={self._rtt_sum / self._acked * 1e3:.0f}ms "
+                  f"srtt={self.srtt * 1e3:.0f}ms window={self.window:.1f} lost={self.lost}")
+        self._acked = 0
+        self._rtt_sum = 0.0
+        self._last_report = now
@@ -0,0 +1,26 @@
+import struct
+import time
+
+# version, frame id, capture timestamp (seconds since the epoch), codec
+HEADER = struct.Struct("<BIdB")
+VERSION = 1
+
+CODEC_JPEG = 1
+CODEC_DETECTIONS = 2  # postprocess.DETECTION_DTYPE records instead of an image
+
+
+def pack_frame(frame_id, payload, codec=CODEC_JPEG, timestamp=None):
+    """Prefix an encoded frame with the binary transport header."""
+    if timestamp is None:
+        timestamp = time.time()
+    return HEADER.pack(VERSION, frame_id & 0xFFFFFFFF, timestamp, codec) + bytes(payload)
+
+
+def unpack_frame(data):
+    """Split a binary frame into (frame_id, timestamp, codec, payload)."""
+    if len(data) < HEADER.size:
+        raise ValueError(f"frame of {len(data)} bytes is shorter than its header")
+    version, frame_id, timestamp, codec = HEADER.unpack_from(data)
+    if version != VERSION:
+        raise ValueError(f"unsupported frame version {version}")
+    return frame_id, timestamp, codec, memoryview(data)[HEADER.size:]
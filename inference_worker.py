@@ -0,0 +1,86 @@
+import threading
+from collections import Counter
+
+
+class InferenceWorker:
+    """
+    Runs inference off the Socket.IO event handlers.
+
+    Each client has a depth-1 "latest frame" slot: submit() overwrites any frame
+    still waiting for that client (counting it as dropped) and returns
+    immediately with the frame it replaced, if any. A single background thread takes pending clients in the order
+    they first became pending, calls `process(sid, data)` and passes a non-None
+    result to `emit(sid, result)`, so latency stays bounded under overload.
+    """
+
+    def __init__(self, process, emit):
+        self.process = process
+        self.emit = emit
+        self.dropped = Counter()
+        self.processed = Counter()
+        self._pending = {}  # sid -> newest frame, in insertion order
+        self._active = set()  # sids submitted since their last discard()
+        self._cond = threading.Condition()
+        self._running = False
+        self._thread = None
+
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout=2.0)
+
+    def submit(self, sid, data):
+        """Make `data` the client's pending frame; returns the frame it replaced, or None."""
+        with self._cond:
+            replaced = self._pending.get(sid)
+            if replaced is not None:
+                self.dropped[sid] += 1
+            self._active.add(sid)
+            self._pending[sid] = data
+            self._cond.notify()
+        return replaced
+
+    def discard(self, sid):
+        """Forget a client's pending frame and counters, e.g. on disconnect."""
+        with self._cond:
+            self._pending.pop(sid, None)
+            self._active.discard(sid)
+            self.dropped.pop(sid, None)
+            self.processed.pop(sid, None)
+
+    def _count_processed(self, sid):
+        # A frame that finishes after discard(sid) must not bring the sid back
+        with self._cond:
+            if sid in self._active:
+                self.processed[sid] += 1
+                return True
+            return False
+
+    def pending(self):
+        return len(self._pending)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._pending or not self._running)
+                if not self._running:
+                    return
+                sid = next(iter(self._pending))
+                data = self._pending.pop(sid)
+
+            try:
+                result = self.process(sid, data)
+            except Exception as e:  # one bad frame must not stop the worker
+                print(f"Inference failed for {sid}: {e}")
+                continue
+            self._count_processed(sid)
+            if result is not None:
+                self.emit(sid, result)
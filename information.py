@@ -1,3 +1,5 @@
+from postprocess import allowed_classes, color_lut
+
 
 classNames = ["person", "bicycle", "car", "motorbike", "aeroplane", "bus", "train", "truck", "boat",
               "traffic light", "fire hydrant", "stop sign", "parking meter", "bench", "bird", "cat",
@@ -13,6 +15,14 @@ classNames = ["person", "bicycle", "car", "motorbike", "aeroplane", "bus", "trai
 
 excluded_classes = {"person"}
 
+# Detector runtime for every entry point, passed to LazyModel (see detector_backend.py)
+detector_options = {
+    "backend": "torch",  # or an "onnx" / "openvino" export
+    "int8": False,  # Use the INT8-quantized export
+    "threads": None,  # CPU threads for inference (None: runtime default)
+    "auto_export": True,  # Build a missing or stale export on first start; later starts load it from disk
+}
+
 
 class_colors = {
     "person": (255, 0, 0),
@@ -97,3 +107,7 @@ class_colors = {
     "toothbrush": (255, 64, 255)
 }
 
+# Index-based tables for the per-frame code: the class IDs the detector is
+# asked for (classes=allowed_class_ids), and colors looked up by class ID
+allowed_class_ids = allowed_classes(classNames, excluded_classes)
+class_color_lut = color_lut(classNames, class_colors)
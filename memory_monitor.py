@@ -0,0 +1,113 @@
+import gc
+import os
+import sys
+import threading
+import time
+from collections import deque
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+
+def rss_bytes():
+    """Resident set size of this process in bytes."""
+    if psutil is not None:
+        return psutil.Process().memory_info().rss
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        import resource
+        # Peak rather than current RSS; KiB on Linux, bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _trackers(model):
+    predictor = getattr(model, "predictor", None)
+    return getattr(predictor, "trackers", None) or []
+
+
+def tracker_state(model):
+    """Number of tracked, lost and removed tracks held by the model's trackers."""
+    counts = {"tracked": 0, "lost": 0, "removed": 0}
+    for tracker in _trackers(model):
+        counts["tracked"] += len(tracker.tracked_stracks)
+        counts["lost"] += len(tracker.lost_stracks)
+        counts["removed"] += len(tracker.removed_stracks)
+    return counts
+
+
+def trim_tracker_state(model):
+    """Drop finished tracks the trackers keep around for bookkeeping only."""
+    for tracker in _trackers(model):
+        tracker.removed_stracks.clear()
+
+
+def memory_report(trajectories=None, canvases=(), model=None):
+    """Bytes held by each long-lived structure, plus process RSS."""
+    report = {"rss": rss_bytes()}
+    if trajectories is not None:
+        report["trajectories"] = trajectories.nbytes()
+        report["tracks"] = len(trajectories)
+    report["canvases"] = sum(c.nbytes for c in canvases if c is not None)
+    if model is not None:
+        report.update({f"tracker_{k}": v for k, v in tracker_state(model).items()})
+    return report
+
+
+def reclaim(trajectories=None, model=None):
+    """Evict idle tracks, trim tracker bookkeeping and run a full GC pass."""
+    if trajectories is not None:
+        trajectories.evict_stale()
+    if model is not None:
+        trim_tracker_state(model)
+    gc.collect()
+
+
+def format_report(report):
+    parts = []
+    for name, value in report.items():
+        if name in ("rss", "trajectories", "canvases"):
+            parts.append(f"{name}={value / 2**20:.1f}MiB")
+        else:
+            parts.append(f"{name}={value}")
+    return " ".join(parts)
+
+
+class MemoryWatchdog(threading.Thread):
+    """
+    Background thread that samples RSS every `interval` seconds, keeps a bounded
+    history of samples and prints a line per sample. `report` is an optional
+    callable returning extra figures, such as memory_report(), for that line.
+    """
+
+    def __init__(self, interval=60.0, report=None, history=1440):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.report = report
+        self.samples = deque(maxlen=history)  # (timestamp, rss)
+        self._stop_event = threading.Event()
+
+    def run(self):
+        start = time.monotonic()
+        while not self._stop_event.wait(self.interval):
+            report = {"rss": rss_bytes()}
+            if self.report is not None:
+                try:
+                    report.update(self.report())
+                except Exception as e:  # the report must never kill the watchdog
+                    print(f"[memory] report failed: {e}")
+            self.samples.append((time.time(), report["rss"]))
+            print(f"[memory] uptime={(time.monotonic() - start) / 3600:.2f}h {format_report(report)}")
+
+    def growth(self):
+        """RSS change in bytes between the first and last retained samples."""
+        if len(self.samples) < 2:
+            return 0
+        return self.samples[-1][1] - self.samples[0][1]
+
+    def stop(self):
+        self._stop_event.set()
@@ -0,0 +1,200 @@
+import bisect
+import os
+import threading
+import time
+
+# Upper bounds in seconds, from sub-millisecond drawing up to slow inference
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.002, 0.003, 0.005, 0.0075, 0.01, 0.015, 0.025,
+                   0.05, 0.075, 0.1, 0.25, 0.5, 1.0, 2.5)
+QUANTILES = (0.5, 0.95, 0.99)
+
+_imported = time.perf_counter()
+
+
+def process_uptime():
+    """Seconds since this process started (since this module was imported where /proc is missing)."""
+    try:
+        with open("/proc/self/stat") as f:
+            start_ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+        return uptime - start_ticks / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError):
+        return time.perf_counter() - _imported
+
+
+class RollingHistogram:
+    """
+    Bucketed timings. Lifetime bucket counts and sum are kept for Prometheus;
+    the same counts over the last `window` seconds, held in `slots` rotating
+    sub-windows, give current means and quantiles.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS, window=60.0, slots=6):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # the last bucket is +Inf
+        self.sum = 0.0
+        self.count = 0
+        self._slot_length = window / slots
+        self._slot_counts = [[0] * (len(self.buckets) + 1) for _ in range(slots)]
+        self._slot_sums = [0.0] * slots
+        self._slot_epochs = [-1] * slots
+        self._lock = threading.Lock()
+
+    def observe(self, seconds, now=None):
+        epoch = int((time.monotonic() if now is None else now) / self._slot_length)
+        slot = epoch % len(self._slot_epochs)
+        bucket = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            if self._slot_epochs[slot] != epoch:
+                # This slot last held a sub-window that has rolled out
+                self._slot_epochs[slot] = epoch
+                self._slot_counts[slot] = [0] * len(self.counts)
+                self._slot_sums[slot] = 0.0
+            self._slot_counts[slot][bucket] += 1
+            self._slot_sums[slot] += seconds
+            self.counts[bucket] += 1
+            self.sum += seconds
+            self.count += 1
+
+    def snapshot(self):
+        """(bucket counts, sum, count) over the lifetime, read together."""
+        with self._lock:
+            return list(self.counts), self.sum, self.count
+
+    def recent(self, now=None):
+        """(bucket counts, sum) over the rolling window."""
+        epoch = int((time.monotonic() if now is None else now) / self._slot_length)
+        oldest = epoch - len(self._slot_epochs)
+        counts = [0] * len(self.counts)
+        total = 0.0
+        with self._lock:
+            for slot, slot_epoch in enumerate(self._slot_epochs):
+                if slot_epoch > oldest:
+                    counts = [a + b for a, b in zip(counts, self._slot_counts[slot])]
+                    total += self._slot_sums[slot]
+        return counts, total
+
+    def mean(self, now=None):
+        counts, total = self.recent(now)
+        n = sum(counts)
+        return total / n if n else 0.0
+
+    def quantile(self, q, now=None):
+        """Estimate of the q-quantile over the rolling window, interpolated within its bucket."""
+        counts, _ = self.recent(now)
+        target = q * sum(counts)
+        if not target:
+            return 0.0
+        seen = 0
+        for i, count in enumerate(counts):
+            if count and seen + count >= target:
+                if i == len(self.buckets):
+                    return self.buckets[-1]
+                lower = self.buckets[i - 1] if i else 0.0
+                return lower + (self.buckets[i] - lower) * (target - seen) / count
+            seen += count
+        return self.buckets[-1]
+
+
+class _Timer:
+    __slots__ = ("metrics", "stage", "start")
+
+    def __init__(self, metrics, stage):
+        self.metrics = metrics
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics.add(self.stage, time.perf_counter() - self.start)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+class Metrics:
+    """
+    Per-stage timing histograms plus values read when scraped, rendered in
+    the Prometheus text format by render().
+
+    Time a stage with `with metrics.time("encode"): ...` or add(stage,
+    seconds). add() and summary() match StageStats, so a Metrics can stand in
+    for one (e.g. as Pipeline's stats). Recording costs a bucket lookup and an
+    uncontended lock, a few microseconds, so it can stay on in production.
+    """
+
+    def __init__(self, prefix="frame", buckets=DEFAULT_BUCKETS, window=60.0):
+        self.prefix = prefix
+        self.buckets = buckets
+        self.window = window
+        self._stages = {}
+        self._readers = []  # (name, help, kind, label, read)
+        self._lock = threading.Lock()
+
+    def add(self, stage, seconds):
+        histogram = self._stages.get(stage)
+        if histogram is None:
+            with self._lock:
+                histogram = self._stages.setdefault(stage, RollingHistogram(self.buckets, self.window))
+        histogram.observe(seconds)
+
+    def time(self, stage):
+        return _Timer(self, stage)
+
+    def mean(self, stage):
+        histogram = self._stages.get(stage)
+        return histogram.mean() if histogram is not None else 0.0
+
+    def gauge(self, name, help, read, label=None, kind="gauge"):
+        """
+        Report `read()` on every scrape. It returns a number, or with `label`
+        set a {label value: number} dict (e.g. one value per session).
+        """
+        self._readers.append((name, help, kind, label, read))
+
+    def summary(self):
+        parts = []
+        for stage, histogram in list(self._stages.items()):
+            if histogram.count:
+                parts.append(f"{stage}={histogram.mean() * 1e3:.1f}ms(p95 {histogram.quantile(0.95) * 1e3:.1f})")
+        return " ".join(parts)
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format."""
+        name = f"{self.prefix}_stage_seconds"
+        lines = [f"# HELP {name} Time spent in each per-frame stage.", f"# TYPE {name} histogram"]
+        stages = sorted(self._stages.items())
+        for stage, histogram in stages:
+            counts, total, count = histogram.snapshot()
+            label = f'stage="{_escape(stage)}"'
+            cumulative = 0
+            for bound, n in zip(histogram.buckets + ("+Inf",), counts):
+                cumulative += n
+                lines.append(f'{name}_bucket{{{label},le="{bound}"}} {cumulative}')
+            lines.append(f"{name}_sum{{{label}}} {total}")
+            lines.append(f"{name}_count{{{label}}} {count}")
+
+        recent = f"{name}_recent"
+        lines += [f"# HELP {recent} Per-stage quantiles over the last {self.window:g} seconds.",
+                  f"# TYPE {recent} gauge"]
+        for stage, histogram in stages:
+            for q in QUANTILES:
+                lines.append(f'{recent}{{stage="{_escape(stage)}",quantile="{q}"}} {histogram.quantile(q)}')
+
+        for metric, help, kind, label, read in self._readers:
+            try:
+                value = read()
+            except Exception as e:  # a failing reader must not break the scrape
+                print(f"Metric {metric} failed: {e}")
+                continue
+            lines += [f"# HELP {metric} {help}", f"# TYPE {metric} {kind}"]
+            if label is None:
+                lines.append(f"{metric} {value}")
+            else:
+                for key, v in value.items():
+                    lines.append(f'{metric}{{{label}="{_escape(key)}"}} {v}')
+        return "\n".join(lines) + "\n"
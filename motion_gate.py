@@ -0,0 +1,134 @@
+import time
+import cv2
+import numpy as np
+from postprocess import DETECTION_DTYPE
+
+
+class DetectionScheduler:
+    """
+    Decides per frame whether the detector has to run, and predicts the
+    detections of the frames it skips.
+
+    The detector runs on at most every `stride`-th frame. On those frames a
+    downscaled, blurred grayscale probe of the frame is compared with the
+    probe of the last frame the detector saw; if fewer than `motion_threshold`
+    of its pixels changed by more than `pixel_threshold` levels the detector
+    is skipped as well, but never for more than `max_skip` frames in a row.
+
+    Frames skipped for the stride get the last detections moved along each
+    track's constant-velocity estimate, taken between its last two detector
+    runs, for at most `max_extrapolate` frames, so trails keep advancing
+    smoothly in between. Frames skipped as still match the frame the
+    detector last ran on, so they get its detections unmoved: an object that
+    has stopped stays where it stopped.
+    """
+
+    def __init__(self, stride=1, motion_threshold=0.002, pixel_threshold=25, max_skip=30, max_extrapolate=10,
+                 probe_size=(160, 90), report_interval=60.0, name="gate"):
+        self.stride = stride
+        self.motion_threshold = motion_threshold
+        self.pixel_threshold = pixel_threshold
+        self.max_skip = max_skip
+        self.max_extrapolate = max_extrapolate
+        self.probe_size = probe_size
+        self.report_interval = report_interval
+        self.name = name
+        self.frames = 0
+        self.skipped_still = 0  # skipped because nothing moved
+        self.skipped_stride = 0  # skipped because of the stride
+        self._frame = -1
+        self._still = False  # whether the current frame was skipped as still
+        self._detected_frame = None
+        self._reference = None  # probe of the last frame the detector ran on
+        self._detections = None
+        self._velocity = None  # pixels per frame for each of _detections
+        self._centres = {}  # track id -> (cx, cy, frame)
+        self._last_report = time.perf_counter()
+        self._reported = (0, 0, 0)
+
+    def _probe(self, img):
+        small = cv2.resize(img, self.probe_size, interpolation=cv2.INTER_LINEAR)
+        if small.ndim == 3:
+            small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        return cv2.GaussianBlur(small, (5, 5), 0)
+
+    def should_detect(self, img):
+        """Count a new frame and decide whether the detector runs on it."""
+        self._frame += 1
+        self.frames += 1
+        self._still = False
+        self._maybe_report()
+        if self._detected_frame is None:
+            self._reference = self._probe(img)
+            return True
+
+        since = self._frame - self._detected_frame
+        if since < self.stride:
+            self.skipped_stride += 1
+            return False
+        if since >= self.max_skip or self.motion_threshold <= 0:
+            self._reference = self._probe(img)
+            return True
+
+        probe = self._probe(img)
+        changed = np.count_nonzero(cv2.absdiff(probe, self._reference) > self.pixel_threshold)
+        if changed <= self.motion_threshold * probe.size:
+            self.skipped_still += 1
+            self._still = True
+            return False
+        self._reference = probe
+        return True
+
+    def update(self, detections):
+        """Record the detector's output for this frame and return it."""
+        n = len(detections)
+        velocity = np.zeros((n, 2), np.float32)
+        centres = {}
+        for i, (cx, cy, track_id) in enumerate(zip(detections["cx"].tolist(), detections["cy"].tolist(),
+                                                   detections["id"].tolist())):
+            if track_id < 0:
+                continue
+            previous = self._centres.get(track_id)
+            if previous is not None and previous[2] < self._frame:
+                steps = self._frame - previous[2]
+                velocity[i] = ((cx - previous[0]) / steps, (cy - previous[1]) / steps)
+            centres[track_id] = (cx, cy, self._frame)
+
+        self._centres = centres
+        self._detections = detections
+        self._velocity = velocity
+        self._detected_frame = self._frame
+        return detections
+
+    def predict(self):
+        """Detections for a skipped frame, extrapolated from the last detector run."""
+        if self._detections is None:
+            return np.empty(0, DETECTION_DTYPE)
+        if self._still:
+            return self._detections.copy()
+        steps = min(self._frame - self._detected_frame, self.max_extrapolate)
+        offset = np.rint(self._velocity * steps).astype(np.int32)
+        predicted = self._detections.copy()
+        for x, y in (("x1", "y1"), ("x2", "y2"), ("cx", "cy")):
+            predicted[x] += offset[:, 0]
+            predicted[y] += offset[:, 1]
+        return predicted
+
+    def __call__(self, img, detect):
+        """`detect(img)` if the detector has to run on this frame, otherwise predicted detections."""
+        return self.update(detect(img)) if self.should_detect(img) else self.predict()
+
+    def skip_ratio(self):
+        return (self.skipped_still + self.skipped_stride) / self.frames if self.frames else 0.0
+
+    def _maybe_report(self):
+        now = time.perf_counter()
+        if now - self._last_report < self.report_interval:
+            return
+        frames, still, stride = (self.frames - self._reported[0], self.skipped_still - self._reported[1],
+                                 self.skipped_stride - self._reported[2])
+        if frames:
+            print(f"[{self.name}] detector ran on {frames - still - stride}/{frames} frames, "
+                  f"skipped {still / frames:.0%} still + {stride / frames:.0%} stride")
+        self._reported = (self.frames, self.skipped_still, self.skipped_stride)
+        self._last_report = now
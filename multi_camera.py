@@ -0,0 +1,307 @@
+"""
+Multi-source runner: one capture, inference and drawing process per camera
+or file, and a coordinator process that shows all outputs in one window.
+
+    python multi_camera.py 0 1
+    python multi_camera.py 0 1 --trajectory-log trails_{index}.log  # re-render with replay_trails.py
+    python multi_camera.py 0 rtsp://camera-2/stream footage.mp4 --view canvas --tile 960x540
+    python multi_camera.py synthetic synthetic synthetic synthetic --headless --seconds 30
+
+Each worker runs the obj_v2 loop (tracking_loop.TrackingLoop) on its own
+source, with its own detector, tracker, trajectories, trail canvas,
+checkpoint and (with --trajectory-log) trajectory log, so the per-frame
+Python work of the sources runs on separate cores instead of contending for
+one interpreter.
+Workers scale their output to --tile and write it straight into a ring of
+frame buffers in shared memory; the coordinator reads the newest frame of
+each ring without any pickling or copying through pipes, and tiles them
+into one window (or with --headless only reports each source's frame rate).
+
+"synthetic" sources use the fake detector and frames from bench_hotpath.py,
+to measure the runner itself without cameras or a model.
+"""
+import argparse
+import math
+import multiprocessing as mp
+import os
+import time
+from multiprocessing import shared_memory
+import cv2
+import numpy as np
+from detector_backend import BACKENDS
+from information import detector_options
+from pipeline import Pipeline
+from tracking_loop import TrackingLoop
+
+RESIZE = (640, 480)  # Detector input, as in obj_v2
+LINE_INTENSITY = 0.9
+
+
+class FrameRing:
+    """
+    Ring of `slots` same-sized frames in shared memory, written by one
+    process and read by others without locks.
+
+    The writer fills slot() and then publish()es it, which makes it the
+    newest frame. latest() copies the newest frame and checks afterwards that
+    the writer has not come round to that slot again in the meantime,
+    retrying if it has; with three or more slots that only happens when the
+    reader stalls for more than a frame.
+    """
+
+    def __init__(self, shape, slots=3, name=None, create=False):
+        self.shape = tuple(shape)
+        self.slots = slots
+        frame_bytes = int(np.prod(self.shape))
+        header = 64 * math.ceil(8 * (1 + slots) / 64)  # sequence number and per-slot timestamps
+        # Processes started by multiprocessing share the creator's resource
+        # tracker, so attaching registers nothing new and only unlink() frees it
+        self._shm = shared_memory.SharedMemory(name=name, create=create, size=header + slots * frame_bytes)
+        buffer = self._shm.buf
+        self._sequence = np.ndarray((1,), np.int64, buffer, 0)
+        self._times = np.ndarray((slots,), np.float64, buffer, 8)
+        self._frames = np.ndarray((slots,) + self.shape, np.uint8, buffer, header)
+        if create:
+            self._sequence[0] = -1
+
+    @classmethod
+    def create(cls, shape, slots=3):
+        return cls(shape, slots, create=True)
+
+    @property
+    def name(self):
+        return self._shm.name
+
+    def spec(self):
+        """Arguments to attach to this ring from another process."""
+        return self.shape, self.slots, self.name
+
+    @property
+    def sequence(self):
+        """Number of the newest published frame, -1 before the first."""
+        return int(self._sequence[0])
+
+    def slot(self):
+        """The buffer to write the next frame into."""
+        return self._frames[(self.sequence + 1) % self.slots]
+
+    def publish(self, timestamp=None):
+        sequence = self.sequence + 1
+        self._times[sequence % self.slots] = time.time() if timestamp is None else timestamp
+        self._sequence[0] = sequence
+
+    def latest(self, out=None):
+        """(sequence, timestamp, frame) of the newest frame, copied into `out` if given, or None."""
+        while True:
+            sequence = self.sequence
+            if sequence < 0:
+                return None
+            slot = sequence % self.slots
+            timestamp = float(self._times[slot])
+            if out is None:
+                frame = self._frames[slot].copy()
+            else:
+                np.copyto(out, self._frames[slot])
+                frame = out
+            if self.sequence - sequence < self.slots - 1:
+                return sequence, timestamp, frame
+
+    def close(self):
+        # Views into the buffer have to go before the segment can be closed
+        self._sequence = self._times = self._frames = None
+        self._shm.close()
+
+    def unlink(self):
+        self._shm.unlink()
+
+
+class SyntheticCapture:
+    """cv2.VideoCapture stand-in serving bench_hotpath's synthetic frames, with their fake detections."""
+
+    def __init__(self, width=1920, height=1080, tracks=16, seed=0):
+        from bench_hotpath import FakeDetector, SyntheticFrames
+        self.detector = FakeDetector(tracks, *RESIZE, seed=seed)
+        self._frames = SyntheticFrames(width, height, self.detector, seed=seed)
+        self.index = -1
+
+    def read(self):
+        self.index += 1
+        return True, self._frames(self.index)
+
+    def release(self):
+        pass
+
+
+class SyntheticModel:
+    """Stand-in for the model of a SyntheticCapture: track() returns the fake detections of its current frame."""
+
+    def __init__(self, cap):
+        self.cap = cap
+
+    def track(self, img, **kwargs):
+        return self.cap.detector(self.cap.index)
+
+
+def open_source(source, options, index):
+    """(capture, model) for a worker."""
+    if source == "synthetic":
+        cap = SyntheticCapture(tracks=options["synthetic_tracks"], seed=index)
+        return cap, SyntheticModel(cap)
+
+    # Each worker loads its own detector
+    from detector_backend import LazyModel
+    model = LazyModel(options["weights"], options["backend"], int8=options["int8"],
+                      threads=options["threads"]).preload()
+    cap = cv2.VideoCapture(int(source) if source.isdigit() else source)
+    if not cap.isOpened():
+        raise RuntimeError(f"cannot open source {source}")
+    return cap, model
+
+
+def run_source(index, source, ring_spec, stop, options):
+    """Worker process: the obj_v2 loop for one source, rendering into a FrameRing."""
+    ring = FrameRing(*ring_spec)
+    tile_height, tile_width = ring.shape[:2]
+    cap = loop = None
+    try:
+        cap, model = open_source(source, options, index)
+        # "{index}" in the log and checkpoint paths keeps the sources' files apart
+        loop = TrackingLoop(model, RESIZE, trail_history=options["trail_history"], track_ttl=options["track_ttl"],
+                            line_thickness=options["line_thickness"], smooth_trails=options["smooth"],
+                            line_intensity=LINE_INTENSITY, detect_stride=options["detect_stride"],
+                            motion_threshold=options["motion_threshold"], max_skip=options["max_skip"],
+                            trajectory_log=options["trajectory_log"].format(index=index) or None,
+                            checkpoint_path=options["checkpoint"].format(index=index) or None,
+                            checkpoint_interval=options["checkpoint_interval"], view=options["view"],
+                            verbose=False, name=f"gate {index}")
+        # Files are played frame by frame; live sources drop stale frames
+        threaded = source != "synthetic" and not os.path.isfile(source)
+        pipeline = Pipeline(cap, loop.detect, threaded=threaded, report_interval=float("inf"),
+                            stats=loop.metrics).start()
+        for img, detections in pipeline.results():
+            if stop.is_set():
+                break
+            output = loop.render(img, detections)
+            cv2.resize(output, (tile_width, tile_height), dst=ring.slot(), interpolation=cv2.INTER_LINEAR)
+            ring.publish()
+        pipeline.stop()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if loop is not None:
+            loop.close()
+        if cap is not None:
+            cap.release()
+        ring.close()
+
+
+def mosaic(tiles, columns):
+    """The tiles in a grid, `columns` wide, with black cells to fill the last row."""
+    rows = [tiles[i:i + columns] for i in range(0, len(tiles), columns)]
+    rows[-1] = rows[-1] + [np.zeros_like(tiles[0])] * (columns - len(rows[-1]))
+    return np.vstack([np.hstack(row) for row in rows])
+
+
+def run(sources, tile=(640, 360), view="overlay", headless=False, seconds=None, report_interval=5.0, **options):
+    """Coordinator: start a worker per source and show or report their outputs until 'q', Ctrl+C or `seconds`."""
+    shape = (tile[1], tile[0], 3)
+    # Build a missing export once here, not in every worker at the same time
+    if options.get("auto_export") and any(source != "synthetic" for source in sources):
+        from detector_backend import prepare_export
+        prepare_export(options["weights"], options["backend"], options["int8"])
+    rings = [FrameRing.create(shape) for _ in sources]
+    # spawn, not fork: each worker sets up its own detector and threads from scratch
+    context = mp.get_context("spawn")
+    stop = context.Event()
+    options = dict(options, view=view)
+    workers = [context.Process(target=run_source, args=(i, source, ring.spec(), stop, options), daemon=True)
+               for i, (source, ring) in enumerate(zip(sources, rings))]
+    for worker in workers:
+        worker.start()
+
+    columns = math.ceil(math.sqrt(len(sources)))
+    tiles = [np.zeros(shape, np.uint8) for _ in sources]
+    start = last_report = time.perf_counter()
+    reported = [ring.sequence for ring in rings]
+    try:
+        while seconds is None or time.perf_counter() - start < seconds:
+            if not headless:
+                for ring, buffer in zip(rings, tiles):
+                    ring.latest(out=buffer)
+                cv2.imshow("Object Tracking", mosaic(tiles, columns))
+                if cv2.waitKey(1) == ord('q'):
+                    break
+            else:
+                time.sleep(0.1)
+            if not any(worker.is_alive() for worker in workers):
+                break
+
+            now = time.perf_counter()
+            if now - last_report > report_interval:
+                sequences = [ring.sequence for ring in rings]
+                rates = [(s - r) / (now - last_report) for s, r in zip(sequences, reported)]
+                print(f"[multi] fps per source: {' '.join(f'{rate:.1f}' for rate in rates)} "
+                      f"total {sum(rates):.1f}")
+                reported, last_report = sequences, now
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop.set()
+        for worker in workers:
+            worker.join(timeout=5.0)
+            if worker.is_alive():
+                worker.terminate()
+        frames = [ring.sequence + 1 for ring in rings]
+        for ring in rings:
+            ring.close()
+            ring.unlink()
+        if not headless:
+            cv2.destroyAllWindows()
+    return frames
+
+
+def parse_size(text):
+    width, height = text.lower().split("x")
+    return int(width), int(height)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("sources", nargs="+", help="camera indices, video files or URLs, or 'synthetic'")
+    parser.add_argument("--tile", type=parse_size, default=(640, 360), help="size of each source in the window")
+    parser.add_argument("--view", choices=("overlay", "canvas"), default="overlay",
+                        help="trails over the frame, or the trails alone on black")
+    parser.add_argument("--headless", action="store_true", help="no window, only report frame rates")
+    parser.add_argument("--seconds", type=float, help="stop after this long")
+    parser.add_argument("--weights", default="yolov8m.pt")
+    parser.add_argument("--backend", choices=BACKENDS, default=detector_options["backend"],
+                        help="detector runtime (see detector_backend.py)")
+    parser.add_argument("--int8", action="store_true", help="use the INT8-quantized export")
+    parser.add_argument("--threads", type=int, default=None,
+                        help="inference threads per worker (default: the cores divided among the sources)")
+    parser.add_argument("--line-thickness", type=int, default=2)
+    parser.add_argument("--trail-history", type=int, default=100)
+    parser.add_argument("--track-ttl", type=float, default=5.0)
+    parser.add_argument("--smooth", action="store_true", help="anti-aliased curved trail segments")
+    parser.add_argument("--detect-stride", type=int, default=1, help="run the detector on at most every Nth frame")
+    parser.add_argument("--motion-threshold", type=float, default=0.002,
+                        help="fraction of changed pixels below which the detector is skipped (0 disables)")
+    parser.add_argument("--max-skip", type=int, default=30, help="frames the detector may be skipped in a row")
+    parser.add_argument("--trajectory-log", default="",
+                        help="log of each source's drawn track points, e.g. trails_{index}.log (grows without limit)")
+    parser.add_argument("--checkpoint", default="trails_checkpoint_{index}.npz",
+                        help="checkpoint of each source's trails, restored on start ('' disables)")
+    parser.add_argument("--checkpoint-interval", type=float, default=5.0, help="seconds between checkpoints")
+    parser.add_argument("--synthetic-tracks", type=int, default=16, help="objects per synthetic source")
+    args = parser.parse_args()
+
+    threads = args.threads or max(1, (os.cpu_count() or 1) // len(args.sources))
+    frames = run(args.sources, args.tile, args.view, args.headless, args.seconds,
+                 weights=args.weights, backend=args.backend, int8=args.int8 or detector_options["int8"],
+                 threads=threads, auto_export=detector_options["auto_export"],
+                 line_thickness=args.line_thickness, trail_history=args.trail_history,
+                 track_ttl=args.track_ttl, smooth=args.smooth, detect_stride=args.detect_stride,
+                 motion_threshold=args.motion_threshold, max_skip=args.max_skip, trajectory_log=args.trajectory_log,
+                 checkpoint=args.checkpoint, checkpoint_interval=args.checkpoint_interval,
+                 synthetic_tracks=args.synthetic_tracks)
+    print(f"Frames rendered per source: {' '.join(map(str, frames))}")
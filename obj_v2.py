@@ -1,15 +1,15 @@
-from ultralytics import YOLO
-import time
-import os
-import sys
 import cv2
-import numpy as np
-from information import class_colors, classNames, excluded_classes
+from information import detector_options
+from memory_monitor import MemoryWatchdog, memory_report
+from pipeline import Pipeline
+from detector_backend import LazyModel
+from metrics import Metrics, process_uptime
+from tracking_loop import TrackingLoop
 
 
 def run_track():
-    # Initialize YOLO
-    model = YOLO("yolov8m.pt")
+    # Load and warm up YOLO in the background while the camera opens
+    model = LazyModel("yolov8m.pt", **detector_options).preload()
 
     # Configurable parameters
     line_thickness = 2
@@ -17,6 +17,20 @@ def run_track():
     src_img_intensity = 1
     resize_width = 640  # Resize image to 640x480 
     resize_height = 480
+    trail_history = 100  # Points kept per track
+    track_ttl = 5.0  # Seconds before an unseen track is dropped
+    smooth_trails = False  # Anti-aliased curved segments
+    reclaim_interval = 60  # Seconds between memory reclamation passes
+    memory_log_interval = 300  # Seconds between RSS reports
+    pipelined = True  # Capture and inference on their own threads
+    detect_stride = 1  # Run the detector on at most every Nth frame, predicting the others
+    motion_threshold = 0.002  # Fraction of changed pixels below which the detector is skipped (0 disables)
+    motion_pixel_threshold = 25  # Grey-level change that counts a pixel as changed
+    max_skip = 30  # Frames the detector may be skipped in a row
+    trajectory_log = None  # e.g. "trails.log": append drawn track points there for replay_trails.py; grows without limit
+    checkpoint_path = "trails_checkpoint.npz"  # Canvas and trajectories, restored from here on start (None disables)
+    checkpoint_interval = 5  # Seconds between checkpoints
+    restore_distance = 80  # Pixels within which a detection continues a track of the checkpoint
 
     cap = cv2.VideoCapture(0)
     width = cap.get(cv2.CAP_PROP_FRAME_WIDTH)
@@ -29,90 +43,41 @@ def run_track():
 
     print(f"Width: {width}, Height: {height}")
 
-    previous_positions = {}  # Maps unique IDs to positions
-    line_canvas = None
-
-    start_time = time.time()
-
-    while True:
-
-        elapsed_time = time.time() - start_time
-        if elapsed_time > 900:  # 900 = 15 minutes
-            print("15 minutes have passed. Restarting the program.")
-            os.execl(sys.executable, sys.executable, *sys.argv)  # Restart the script
-
-        success, img = cap.read()
-        if not success:
-            break
-
-        resized_img = cv2.resize(img, (resize_width, resize_height))
-
-        # Create black canvas for drawing lines
-        if line_canvas is None:
-            line_canvas = img.copy()
-            line_canvas[:] = (0, 0, 0)
-
-        # Get YOLO detections
-        results = model.track(resized_img, stream=True, persist = True)
-        
-        # Process each detected object
-        for r in results:
-            for box in r.boxes:
-
-                cls = int(box.cls[0])
-                class_name = classNames[cls]
-
-                if class_name in excluded_classes:
-                    continue
-
-                # bbox coordinates & current pos
-                x1, y1, x2, y2 = map(int, box.xyxy[0])
-                # Scale coordinates back to the original resolution if necessary
-                scale_x = width / resize_width
-                scale_y = height / resize_height
-                x1, y1, x2, y2 = int(x1 * scale_x), int(y1 * scale_y), int(x2 * scale_x), int(y2 * scale_y)
-                
-                cv2.rectangle(img, (x1, y1), (x2, y2), (255, 0, 255), 2)
-                current_position = (x1 + (x2 - x1) // 2, y1 + (y2 - y1) // 2)
-                # track id & color
-                track_id = int(box.id[0]) 
-                color = class_colors.get(class_name, (255, 255, 255))
-
-                # # skip tracking "person"
-                # if class_name in excluded_classes:
-                #     # Annotate with class and confidence
-                #     confidence = round(float(box.conf[0]), 2)
-                #     cv2.putText(img, f'{class_name} {confidence}', (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 0, 0), 1)
-                #     continue  
-
-                # If the object has previous positions, use them to draw a smoother curve
-                if track_id in previous_positions:
-                    previous_positions[track_id].append(current_position)
-
-                    # Limit history to 10 points to avoid overcrowded paths
-                    # if len(previous_positions[track_id]) > 100:
-                    #     previous_positions[track_id].pop(0)
-
-                    # smoother curves than cv2.line
-                    points = np.array(previous_positions[track_id], np.int32)
-                    cv2.polylines(line_canvas, [points], isClosed=False, color=color, thickness=line_thickness)
-                
-                else:
-                    # Initialize with the first position
-                    previous_positions[track_id] = [current_position]
-
-                # Annotate with class and confidence
-                confidence = round(float(box.conf[0]), 2)
-                cv2.putText(img, f'{class_name} {confidence}', (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 0, 0), 1)
-
-        # Overlay the line canvas onto the frame
-        img_with_lines = cv2.addWeighted(img, src_img_intensity, line_canvas, line_intensity, 0)
+    # Detection, trails, log and checkpoints, as multi_camera runs them per source
+    metrics = Metrics()
+    loop = TrackingLoop(model, (resize_width, resize_height), trail_history=trail_history, track_ttl=track_ttl,
+                        line_thickness=line_thickness, smooth_trails=smooth_trails, line_intensity=line_intensity,
+                        src_intensity=src_img_intensity, detect_stride=detect_stride,
+                        motion_threshold=motion_threshold, motion_pixel_threshold=motion_pixel_threshold,
+                        max_skip=max_skip, trajectory_log=trajectory_log, checkpoint_path=checkpoint_path,
+                        checkpoint_interval=checkpoint_interval, restore_distance=restore_distance,
+                        reclaim_interval=reclaim_interval, metrics=metrics)
+
+    # Report RSS and per-structure memory instead of restarting periodically
+    watchdog = MemoryWatchdog(interval=memory_log_interval,
+                              report=lambda: memory_report(loop.trajectories,
+                                                           [loop.compositor and loop.compositor.canvas], model))
+    watchdog.start()
+
+    # Capture, inference and rendering overlap; only the newest frame is rendered
+    pipeline = Pipeline(cap, loop.detect, threaded=pipelined, stats=metrics).start()
+
+    first_frame = True
+    for img, detections in pipeline.results():
+        img_with_lines = loop.render(img, detections)
 
         cv2.imshow("Object Tracking with Persistent Curved Lines", img_with_lines)
+
+        if first_frame:
+            print(f"First annotated frame {process_uptime():.2f} s after start")
+            first_frame = False
         
         if cv2.waitKey(1) == ord('q'):
             break
 
+    pipeline.stop()
+    watchdog.stop()
+    loop.close()
     cap.release()
     cv2.destroyAllWindows()
 
@@ -1,16 +1,14 @@
+import asyncio
 import time
-import os
-import sys
 import cv2
-import numpy as np
-import websocket
-import base64
-import json
-from information import class_colors, classNames, excluded_classes
+from information import class_color_lut, classNames, excluded_classes
+from trajectory_store import TrajectoryStore
+from trail_renderer import TrailRenderer
+from compositor import TrailCompositor
+from memory_monitor import MemoryWatchdog, memory_report, reclaim
+from remote_inference import RemoteInferenceClient
 
-# Global dictionary to store previous positions for tracking
-previous_positions = {}  # Maps unique IDs to positions
-line_canvas = None  # Canvas for drawing paths
+compositor = None  # Canvas for drawing paths
 
 # Configurable parameters for drawing
 line_thickness = 2
@@ -18,6 +16,20 @@ line_intensity = 0.9
 src_img_intensity = 1
 resize_width = 640  # Resize image to 640x480 
 resize_height = 480
+trail_history = 100  # Points kept per track
+track_ttl = 5.0  # Seconds before an unseen track is dropped
+smooth_trails = False  # Anti-aliased curved segments
+reclaim_interval = 60  # Seconds between memory reclamation passes
+memory_log_interval = 300  # Seconds between RSS reports
+
+# WebSocket Server URL (replace with your actual WebSocket endpoint URL, or
+# run fake_inference_server.py and use ws://localhost:8765)
+websocket_url = "ws://<your-azure-websocket-endpoint>"
+inference_window = 4  # Frames sent to the endpoint before waiting for results
+
+# Bounded store of previous positions for tracking
+trajectories = TrajectoryStore(capacity=trail_history, ttl=track_ttl)
+renderer = TrailRenderer(thickness=line_thickness, smooth=smooth_trails)
 
 # Video capture setup
 cap = cv2.VideoCapture(0)
@@ -31,124 +43,106 @@ cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
 
 print(f"Width: {width}, Height: {height}")
 
-def on_message(ws, message):
+def draw_predictions(img, results):
     """
-    This function handles incoming WebSocket messages (the inference result).
+    Draw the inference result for one captured frame: boxes, labels and the
+    newest trail segments. Returns the frame with the trails overlaid.
     """
-    global previous_positions, line_canvas
-    
-    data = json.loads(message)
-    img = data['image']  # The image with bounding boxes drawn (returned by Azure model)
-    results = data['predictions']  # Detection results (bounding boxes, class IDs, and confidences)
+    global compositor
 
     # Create black canvas for drawing lines if not created
-    if line_canvas is None:
-        line_canvas = img.copy()
-        line_canvas[:] = (0, 0, 0)
+    if compositor is None:
+        compositor = TrailCompositor(img.shape, line_intensity, src_img_intensity)
+
+    trajectories.evict_stale()
+
+    # Scale coordinates back to the original resolution if necessary
+    scale_x = img.shape[1] / resize_width
+    scale_y = img.shape[0] / resize_height
 
     # Process each detected object
     for detection in results:
         cls = detection['class']
-        class_name = classNames.get(cls, "Unknown")
+        class_name = classNames[cls] if 0 <= cls < len(classNames) else "Unknown"
         
         if class_name in excluded_classes:
             continue
 
         # Bounding box coordinates
         x1, y1, x2, y2 = map(int, detection['bbox'])
-
-        # Scale coordinates back to the original resolution if necessary
-        scale_x = width / resize_width
-        scale_y = height / resize_height
         x1, y1, x2, y2 = int(x1 * scale_x), int(y1 * scale_y), int(x2 * scale_x), int(y2 * scale_y)
 
         cv2.rectangle(img, (x1, y1), (x2, y2), (255, 0, 255), 2)
         current_position = (x1 + (x2 - x1) // 2, y1 + (y2 - y1) // 2)
         track_id = detection['id']  # Track ID
-        color = class_colors.get(class_name, (255, 255, 255))  # Get color for the track
-
-        # If the object has previous positions, update the track
-        if track_id in previous_positions:
-            previous_positions[track_id].append(current_position)
+        color = class_color_lut[cls].tolist() if 0 <= cls < len(class_color_lut) else (255, 255, 255)  # Get color for the track
 
-            # Limit the number of points to avoid overcrowding paths
-            if len(previous_positions[track_id]) > 100:
-                previous_positions[track_id].pop(0)
-
-            # Draw the path for this object
-            points = np.array(previous_positions[track_id], np.int32)
-            cv2.polylines(line_canvas, [points], isClosed=False, color=color, thickness=line_thickness)
-        
-        else:
-            # Initialize the track with the first position
-            previous_positions[track_id] = [current_position]
+        # Update the track and draw the newest segment of its path
+        trajectories.append(track_id, current_position)
+        compositor.draw(renderer, trajectories.tail(track_id, 3), color)
 
         # Annotate with class name and confidence
         confidence = round(detection['confidence'], 2)
         cv2.putText(img, f'{class_name} {confidence}', (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 0, 0), 1)
 
-    # Overlay the path (line_canvas) onto the original image
-    img_with_lines = cv2.addWeighted(img, src_img_intensity, line_canvas, line_intensity, 0)
-    cv2.imshow("Object Tracking with Persistent Curved Lines", img_with_lines)
-
-def on_error(ws, error):
-    print(f"Error: {error}")
-
-def on_close(ws, close_status_code, close_msg):
-    print("### closed ###")
-
-def on_open(ws):
-    print("WebSocket connection opened")
-
-def run_track():
-    # WebSocket Server URL (replace with your actual WebSocket endpoint URL)
-    websocket_url = "ws://<your-azure-websocket-endpoint>"
-    
-    # Start the WebSocket listener in a separate thread
-    ws = websocket.WebSocketApp(websocket_url,
-                                on_message=on_message,
-                                on_error=on_error,
-                                on_close=on_close)
-    
-    # Create the WebSocket connection
-    ws.run_forever()
-
-    start_time = time.time()
+    # Overlay the paths onto the original image, in place
+    return compositor.blend(img)
 
+async def send_frames(client):
+    loop = asyncio.get_running_loop()
     while True:
-
-        elapsed_time = time.time() - start_time
-        if elapsed_time > 900:  # 900 = 15 minutes
-            print("15 minutes have passed. Restarting the program.")
-            os.execl(sys.executable, sys.executable, *sys.argv)  # Restart the script
-
-        success, img = cap.read()
+        # cap.read blocks, so keep it off the event loop
+        success, img = await loop.run_in_executor(None, cap.read)
         if not success:
             break
 
         resized_img = cv2.resize(img, (resize_width, resize_height))
-
-        # Convert the frame to base64 encoding for transmission
         _, buffer = cv2.imencode('.jpg', resized_img)
-        jpg_as_text = base64.b64encode(buffer).decode('utf-8')
 
-        # Prepare the payload to send to Azure ML via WebSocket
-        data = {
-            'image': jpg_as_text
-        }
+        # Waits only while `inference_window` frames are already in flight
+        await client.submit(buffer.tobytes(), context=img)
+
+    # No more frames: stop once everything sent has been answered
+    await client.drain()
+    await client.close()
+
+async def show_results(client):
+    last_reclaim = time.time()
+
+    # Results come back in capture order, even when the endpoint answers out of order
+    async for _, img, predictions in client.results():
 
-        # Send the frame to the Azure WebSocket server
-        try:
-            ws.send(json.dumps(data))
-        except Exception as e:
-            print(f"Error sending data to WebSocket: {e}")
+        if time.time() - last_reclaim > reclaim_interval:
+            reclaim(trajectories)
+            last_reclaim = time.time()
 
-        # Wait for the response and process it in the on_message callback
-        cv2.waitKey(1)  # Process frames at a normal speed
+        cv2.imshow("Object Tracking with Persistent Curved Lines", draw_predictions(img, predictions))
 
         if cv2.waitKey(1) == ord('q'):
             break
 
+async def run_track_async():
+    client = RemoteInferenceClient(websocket_url, window=inference_window)
+    connection = asyncio.create_task(client.run())
+    sender = asyncio.create_task(send_frames(client))
+
+    await show_results(client)
+
+    sender.cancel()
+    await client.close()
+    await connection
+    print(f"Sent {client.sent} frames, {client.completed} answered, {client.timed_out} timed out, "
+          f"{client.reconnects} reconnects")
+
+def run_track():
+    # Report RSS and per-structure memory instead of restarting periodically
+    watchdog = MemoryWatchdog(interval=memory_log_interval,
+                              report=lambda: memory_report(trajectories, [compositor and compositor.canvas]))
+    watchdog.start()
+
+    asyncio.run(run_track_async())
+
+    watchdog.stop()
     cap.release()
     cv2.destroyAllWindows()
 
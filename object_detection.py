@@ -1,10 +1,11 @@
-from ultralytics import YOLO
 import cv2
 
-from information import class_colors, classNames, excluded_classes
+from information import allowed_class_ids, class_color_lut, classNames, detector_options
+from detector_backend import LazyModel
+from metrics import process_uptime
 
 # YOLO weights
-model = YOLO("yolov8m.pt")
+model = LazyModel("yolov8m.pt", **detector_options).preload()
 
 cap = cv2.VideoCapture(0)
 
@@ -24,6 +25,7 @@ src_img_intensity = 1
 
 previous_positions = {}
 line_canvas = None
+first_frame = True
 
 while True:
     success, img = cap.read()
@@ -34,18 +36,14 @@ while True:
         line_canvas = img.copy()
         line_canvas[:] = (0, 0, 0)  # Set canvas to black
 
-    results = model.track(img, stream=True)
+    # Excluded classes are dropped before NMS and tracking
+    results = model.track(img, stream=True, classes=allowed_class_ids)
 
     # Loop through detections and track objects
     for r in results:
         boxes = r.boxes
 
         for box in boxes:
-
-            if class_name in excluded_classes:
-                continue
-
-
             cls = int(box.cls[0])
             class_name = classNames[cls]
             # Bounding box coordinates,  bounding box, confidence
@@ -58,8 +56,8 @@ while True:
             # Calculate the current position (center of the bounding box)
             current_position = (x1 + (x2 - x1) // 2, y1 + (y2 - y1) // 2)
 
-            # Get the color for this class from the class_colors dictionary, or default to white if not found
-            color = class_colors.get(class_name, (255, 255, 255))
+            # Get the color for this class, white for classes without one
+            color = class_color_lut[cls].tolist()
             
             if object_id in previous_positions:
                 previous_position = previous_positions[object_id]
@@ -79,6 +77,10 @@ while True:
     
     cv2.imshow("Object Tracking with Persistent Lines", img_with_lines)
 
+    if first_frame:
+        print(f"First annotated frame {process_uptime():.2f} s after start")
+        first_frame = False
+
     if cv2.waitKey(1) == ord('q'):
         break
 
@@ -0,0 +1,72 @@
+import cv2
+from information import class_color_lut, classNames
+
+
+def draw_detections(img, compositor, detections, trajectories, renderer, now=None):
+    """
+    Box and label each detection on `img` and extend the trails of tracked
+    ones on the TrailCompositor's canvas. `now` is the frame time used for
+    track expiry.
+    """
+    # Colors for all detections in one lookup
+    colors = class_color_lut[detections["cls"]].tolist()
+
+    # Process each detected object
+    for (x1, y1, x2, y2, cx, cy, cls, conf, track_id), color in zip(detections.tolist(), colors):
+        class_name = classNames[cls]
+        cv2.rectangle(img, (x1, y1), (x2, y2), (255, 0, 255), 2)
+
+        # Extend the trail by the segment since the last frame
+        if track_id >= 0:
+            trajectories.append(track_id, (cx, cy), now)
+            compositor.draw(renderer, trajectories.tail(track_id, 3), color)
+
+        # Annotate with class and confidence
+        cv2.putText(img, f'{class_name} {round(conf, 2)}', (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 0, 0), 1)
+
+
+def draw_class_colored(img, compositor, detections, trajectories, renderer, names, color_lut, now=None):
+    """
+    draw_detections with boxes and labels in the class colors of `color_lut`,
+    and class names looked up in the `names` dict of the loaded model, as the
+    server draws them.
+    """
+    colors = color_lut[detections["cls"]].tolist()
+    for (x1, y1, x2, y2, cx, cy, cls, conf, track_id), color in zip(detections.tolist(), colors):
+        class_name = names.get(cls, 'Unknown')
+
+        # Draw tracking lines
+        if track_id >= 0:
+            trajectories.append(track_id, (cx, cy), now)
+            compositor.draw(renderer, trajectories.tail(track_id, 3), color)
+
+        # Draw bounding box and label
+        cv2.rectangle(img, (x1, y1), (x2, y2), color, 2)
+        cv2.putText(img, f'{class_name} {round(conf, 2)}', (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 1)
+
+
+def draw_over_black(compositor, detections, trajectories, renderer, keep, now=None):
+    """
+    Trails of the tracked detections whose class is set in the `keep` mask,
+    on black, with every detection boxed and labelled on top; returns the
+    compositor's over_black() buffer.
+    """
+    tracked = keep[detections["cls"]] & (detections["id"] >= 0)
+    colors = class_color_lut[detections["cls"]].tolist()
+    detections = detections.tolist()
+
+    # Extend the trails by the segment since the last frame
+    for (x1, y1, x2, y2, cx, cy, cls, conf, track_id), is_tracked, color in zip(detections, tracked.tolist(), colors):
+        if is_tracked:
+            trajectories.append(track_id, (cx, cy), now)
+            compositor.draw(renderer, trajectories.tail(track_id, 3), color)
+
+    # Blending onto black is a copy of the scaled trails; boxes and labels go on top
+    output_canvas = compositor.over_black()
+    for x1, y1, x2, y2, cx, cy, cls, conf, track_id in detections:
+        class_name = classNames[cls]
+        cv2.rectangle(output_canvas, (x1, y1), (x2, y2), (255, 0, 255), 2)
+
+        # Annotate with class and confidence
+        cv2.putText(output_canvas, f'{class_name} {round(conf, 2)}', (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 0, 0), 1)
+    return output_canvas
@@ -0,0 +1,177 @@
+import threading
+import time
+from collections import deque
+
+
+class LatestQueue:
+    """
+    Bounded hand-off between two threads that drops the oldest item instead of
+    blocking the producer, so a slow consumer always gets the freshest data.
+    """
+
+    def __init__(self, maxsize=1):
+        self._items = deque(maxlen=maxsize)
+        self._cond = threading.Condition()
+        self._closed = False
+        self.dropped = 0
+
+    def put(self, item):
+        with self._cond:
+            if len(self._items) == self._items.maxlen:
+                self.dropped += 1
+            self._items.append(item)
+            self._cond.notify()
+
+    def get(self, timeout=None):
+        """Next item, or None once the queue is closed and empty (or on timeout)."""
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._items or self._closed, timeout):
+                return None
+            return self._items.popleft() if self._items else None
+
+    def __len__(self):
+        return len(self._items)
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+
+class StageStats:
+    """Rolling per-stage timings over the last `window` samples."""
+
+    def __init__(self, window=300):
+        self._samples = {}
+        self._window = window
+        self._lock = threading.Lock()
+
+    def add(self, stage, seconds):
+        with self._lock:
+            samples = self._samples.get(stage)
+            if samples is None:
+                samples = self._samples[stage] = deque(maxlen=self._window)
+            samples.append(seconds)
+
+    def mean(self, stage):
+        with self._lock:
+            samples = self._samples.get(stage)
+            return sum(samples) / len(samples) if samples else 0.0
+
+    def discard(self, stage):
+        with self._lock:
+            self._samples.pop(stage, None)
+
+    def summary(self):
+        with self._lock:
+            snapshot = {stage: sorted(samples) for stage, samples in self._samples.items()}
+        parts = []
+        for stage, values in snapshot.items():
+            if values:
+                mean = sum(values) / len(values)
+                p95 = values[int(0.95 * (len(values) - 1))]
+                parts.append(f"{stage}={mean * 1e3:.1f}ms(p95 {p95 * 1e3:.1f})")
+        return " ".join(parts)
+
+
+class Pipeline:
+    """
+    Capture -> inference -> render pipeline with latest-frame semantics.
+
+    A capture thread reads `cap` as fast as the camera delivers and an
+    inference thread runs `detect(img)` on the newest frame only; the two are
+    joined by depth-1 LatestQueues, so stale frames are dropped rather than
+    queued. The caller renders on its own (display) thread by iterating
+    results(), which yields (img, detections) pairs.
+
+    With threaded=False the same loop runs serially, which is useful for
+    comparison and for sources that must not drop frames (e.g. video files).
+    Stage timings go to `stats` (a StageStats unless one is passed in).
+    """
+
+    def __init__(self, cap, detect, threaded=True, report_interval=10.0, stats=None):
+        self.cap = cap
+        self.detect = detect
+        self.threaded = threaded
+        self.report_interval = report_interval
+        self.stats = stats if stats is not None else StageStats()
+        self.frames = 0
+        self._captured = LatestQueue()
+        self._inferred = LatestQueue()
+        self._running = False
+        self._threads = []
+
+    def start(self):
+        self._running = True
+        if self.threaded:
+            self._threads = [threading.Thread(target=self._capture_loop, daemon=True),
+                             threading.Thread(target=self._inference_loop, daemon=True)]
+            for thread in self._threads:
+                thread.start()
+        return self
+
+    def stop(self):
+        self._running = False
+        self._captured.close()
+        self._inferred.close()
+        for thread in self._threads:
+            thread.join(timeout=2.0)
+
+    def _read(self):
+        start = time.perf_counter()
+        success, img = self.cap.read()
+        captured_at = time.perf_counter()
+        self.stats.add("capture", captured_at - start)
+        return (img, captured_at) if success else None
+
+    def _infer(self, item):
+        img, captured_at = item
+        start = time.perf_counter()
+        detections = self.detect(img)
+        self.stats.add("detect", time.perf_counter() - start)
+        return img, detections, captured_at
+
+    def _capture_loop(self):
+        while self._running:
+            item = self._read()
+            if item is None:
+                break
+            self._captured.put(item)
+        self._captured.close()
+
+    def _inference_loop(self):
+        while self._running:
+            item = self._captured.get()
+            if item is None:
+                break
+            self._inferred.put(self._infer(item))
+        self._inferred.close()
+
+    def results(self):
+        """Yield (img, detections) for each frame to render; stale frames are skipped."""
+        last_report = time.perf_counter()
+        while self._running:
+            if self.threaded:
+                item = self._inferred.get()
+            else:
+                captured = self._read()
+                item = self._infer(captured) if captured is not None else None
+            if item is None:
+                break
+
+            img, detections, captured_at = item
+            render_start = time.perf_counter()
+            yield img, detections
+            now = time.perf_counter()
+            self.stats.add("render", now - render_start)
+            self.stats.add("latency", now - captured_at)
+            self.frames += 1
+
+            if now - last_report > self.report_interval:
+                self.report(now - last_report)
+                last_report = now
+                self.frames = 0
+
+    def report(self, elapsed):
+        print(f"[pipeline] fps={self.frames / elapsed:.1f} {self.stats.summary()} "
+              f"dropped capture={self._captured.dropped} inference={self._inferred.dropped}")
@@ -0,0 +1,79 @@
+import numpy as np
+
+# One row per kept detection, in the coordinates of the displayed frame
+DETECTION_DTYPE = np.dtype([
+    ("x1", np.int32), ("y1", np.int32), ("x2", np.int32), ("y2", np.int32),
+    ("cx", np.int32), ("cy", np.int32),
+    ("cls", np.int16), ("conf", np.float32), ("id", np.int32),
+])
+
+
+def _names(class_names):
+    # model.names is a {class ID: name} dict, information.classNames a list
+    if isinstance(class_names, dict):
+        return [class_names[i] for i in range(len(class_names))]
+    return list(class_names)
+
+
+def class_mask(class_names, excluded):
+    """Boolean array indexed by class ID, True for classes that are kept."""
+    return np.array([name not in excluded for name in _names(class_names)], dtype=bool)
+
+
+def allowed_classes(class_names, excluded):
+    """
+    Class IDs that are not excluded, for the detector's `classes` argument:
+    boxes of other classes are then dropped before NMS and never reach the
+    tracker.
+    """
+    return np.flatnonzero(class_mask(class_names, excluded)).tolist()
+
+
+def color_lut(class_names, colors, default=(255, 255, 255)):
+    """(classes, 3) uint8 array of BGR colors indexed by class ID; `default` for unlisted classes."""
+    return np.array([colors.get(name, default) for name in _names(class_names)], dtype=np.uint8).reshape(-1, 3)
+
+
+def _numpy(values):
+    return values.cpu().numpy() if hasattr(values, "cpu") else np.asarray(values)
+
+
+def extract_detections(results, scale_x=1.0, scale_y=1.0, keep=None):
+    """
+    Pull boxes, classes, confidences and track IDs out of YOLO `Results` in one
+    pass per result and return them as a DETECTION_DTYPE array.
+
+    Boxes are scaled by (scale_x, scale_y), classes where `keep` (see
+    class_mask) is False are dropped, and detections the tracker has not
+    assigned an ID yet get id -1.
+    """
+    chunks = []
+    for r in results:
+        boxes = r.boxes
+        if boxes is None or len(boxes) == 0:
+            continue
+
+        cls = _numpy(boxes.cls).astype(np.int16)
+        if keep is not None:
+            mask = keep[cls]
+            if not mask.any():
+                continue
+        else:
+            mask = slice(None)
+
+        xyxy = _numpy(boxes.xyxy)[mask].astype(np.int32)
+        if scale_x != 1.0 or scale_y != 1.0:
+            xyxy = (xyxy * np.array([scale_x, scale_y, scale_x, scale_y])).astype(np.int32)
+
+        out = np.empty(len(xyxy), DETECTION_DTYPE)
+        out["x1"], out["y1"], out["x2"], out["y2"] = xyxy.T
+        out["cx"] = xyxy[:, 0] + (xyxy[:, 2] - xyxy[:, 0]) // 2
+        out["cy"] = xyxy[:, 1] + (xyxy[:, 3] - xyxy[:, 1]) // 2
+        out["cls"] = cls[mask]
+        out["conf"] = _numpy(boxes.conf)[mask]
+        out["id"] = -1 if boxes.id is None else _numpy(boxes.id)[mask]
+        chunks.append(out)
+
+    if not chunks:
+        return np.empty(0, DETECTION_DTYPE)
+    return chunks[0] if len(chunks) == 1 else np.concatenate(chunks)
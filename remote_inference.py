@@ -0,0 +1,133 @@
+import asyncio
+import base64
+import json
+import time
+import websockets
+
+
+class RemoteInferenceClient:
+    """
+    Pipelined asyncio client for a WebSocket inference endpoint.
+
+    Every request carries an id and up to `window` requests are in flight at
+    once; sending and receiving run concurrently. Results may arrive in any
+    order and are released by results() in request order, with requests that
+    time out skipped. If the connection drops, the client reconnects and
+    re-sends every request that has not been answered yet.
+
+    Requests are JSON {"id": n, "image": <base64 JPEG>}; responses are JSON
+    {"id": n, "predictions": [...]}.
+    """
+
+    def __init__(self, url, window=4, timeout=5.0, reconnect_delay=1.0):
+        self.url = url
+        self.window = window
+        self.timeout = timeout
+        self.reconnect_delay = reconnect_delay
+        self.sent = 0
+        self.completed = 0
+        self.timed_out = 0
+        self.reconnects = 0
+        self._slots = asyncio.Semaphore(window)
+        self._next_id = 0
+        self._next_release = 0
+        self._pending = {}  # id -> (message, context, sent_at)
+        self._done = {}  # id -> (context, predictions), waiting for release in order
+        self._results = asyncio.Queue()
+        self._ws = None
+        self._connected = asyncio.Event()
+        self._closed = False
+
+    async def submit(self, jpeg, context=None):
+        """Send one encoded frame once a window slot is free; `context` comes back with its result."""
+        await self._slots.acquire()
+        request_id = self._next_id
+        self._next_id += 1
+        message = json.dumps({"id": request_id, "image": base64.b64encode(jpeg).decode("utf-8")})
+        self._pending[request_id] = (message, context, time.perf_counter())
+        await self._send(message)
+        self.sent += 1
+        return request_id
+
+    async def _send(self, message):
+        await self._connected.wait()
+        try:
+            await self._ws.send(message)
+        except websockets.ConnectionClosed:
+            pass  # re-sent after reconnecting
+
+    async def results(self):
+        """Yield (request_id, context, predictions) in request order."""
+        while True:
+            item = await self._results.get()
+            if item is None:
+                return
+            yield item
+
+    async def run(self):
+        """Maintain the connection until close(); run this as a task."""
+        expiry = asyncio.create_task(self._expire_loop())
+        try:
+            while not self._closed:
+                try:
+                    async with websockets.connect(self.url, max_size=None) as ws:
+                        self._ws = ws
+                        self._connected.set()
+                        # Resume: anything unanswered on the old connection is sent again
+                        for message, _, _ in list(self._pending.values()):
+                            await ws.send(message)
+                        await self._receive(ws)
+                except (OSError, websockets.WebSocketException) as e:
+                    if not self._closed:
+                        print(f"Inference connection lost: {e}")
+                self._connected.clear()
+                if not self._closed:
+                    self.reconnects += 1
+                    await asyncio.sleep(self.reconnect_delay)
+        finally:
+            expiry.cancel()
+            self._results.put_nowait(None)
+
+    async def _receive(self, ws):
+        async for message in ws:
+            data = json.loads(message)
+            pending = self._pending.pop(data.get("id"), None)
+            if pending is None:
+                continue  # duplicate after a resume, or already timed out
+            self._done[data["id"]] = (pending[1], data.get("predictions", []))
+            self.completed += 1
+            self._slots.release()
+            self._release_in_order()
+
+    def _release_in_order(self):
+        while self._next_release < self._next_id:
+            request_id = self._next_release
+            if request_id in self._done:
+                context, predictions = self._done.pop(request_id)
+                self._results.put_nowait((request_id, context, predictions))
+            elif request_id in self._pending:
+                return  # still waiting for this one
+            self._next_release += 1
+
+    async def _expire_loop(self):
+        while True:
+            await asyncio.sleep(self.timeout / 4)
+            cutoff = time.perf_counter() - self.timeout
+            expired = [i for i, (_, _, sent_at) in self._pending.items() if sent_at < cutoff]
+            for request_id in expired:
+                del self._pending[request_id]
+                self.timed_out += 1
+                self._slots.release()
+            if expired:
+                self._release_in_order()
+
+    async def drain(self):
+        """Wait until every submitted request is answered or has timed out."""
+        while self._pending:
+            await asyncio.sleep(0.05)
+
+    async def close(self):
+        self._closed = True
+        self._connected.set()  # wake senders waiting for a connection
+        if self._ws is not None:
+            await self._ws.close()
@@ -0,0 +1,145 @@
+"""
+Re-render the trail canvas from a trajectory log (see trajectory_log.py), at
+any resolution and without a camera or model.
+
+    python replay_trails.py trails.log trails.png
+    python replay_trails.py trails.log poster.png --size 7680x4320 --smooth
+    python replay_trails.py trails.log last_hour.png --start -3600 --intensity 0.9
+
+Segments are drawn in the order they were drawn live, with the same
+renderer settings, so at the logged resolution the canvas matches the live
+one. A track is split where it went unseen for longer than --ttl, as the
+live TrajectoryStore drops it then. --start and --end are seconds from the
+start of the log, or from its end when negative.
+"""
+import argparse
+import time
+import cv2
+import numpy as np
+from information import class_color_lut
+from trail_renderer import TrailRenderer
+from trajectory_log import BREAK, read_log
+
+CHUNK = 1 << 18  # Segments converted and drawn at a time, to bound memory
+
+
+def segments(records, ttl=5.0):
+    """
+    Indices (previous, start, end) into `records` of every drawn segment, in
+    drawing order. `previous` is the point before `start` on the same track,
+    or `start` itself at the beginning of a track.
+    """
+    ids = np.asarray(records["id"])
+    runs = np.cumsum(ids == BREAK)
+    rows = np.flatnonzero(ids != BREAK)
+    # Group by run and track, chronological within each track
+    rows = rows[np.lexsort((rows, ids[rows], runs[rows]))]
+    t = np.asarray(records["t"])[rows]
+    joined = ((runs[rows[1:]] == runs[rows[:-1]]) & (ids[rows[1:]] == ids[rows[:-1]])
+              & (t[1:] - t[:-1] <= ttl))
+
+    start, end = rows[:-1][joined], rows[1:][joined]
+    # The segment before, if it is on the same track, provides the previous point
+    before = np.concatenate(([False], joined[:-1]))[joined]
+    previous = np.where(before, np.concatenate((rows[:1], rows[:-2]))[joined], start)
+
+    order = np.argsort(end, kind="stable")
+    return previous[order], start[order], end[order]
+
+
+def render(records, log_size, size=None, thickness=None, smooth=False, ttl=5.0, by_class=False,
+           colors=class_color_lut):
+    """
+    The trail canvas for `records` (LOG_DTYPE, e.g. from read_log) logged in
+    a `log_size` frame, rendered at `size` (the logged size by default).
+    `thickness` defaults to the live 2 pixels scaled to the output size.
+
+    Segments are drawn in their live order, one call per run of segments of
+    the same class. With `by_class` all segments of a class are drawn in one
+    call instead, which is much faster when classes interleave, but where
+    trails of different classes cross the later one is not always on top.
+    """
+    width, height = size or log_size
+    scale = np.array([width / log_size[0], height / log_size[1]], np.float32)
+    if thickness is None:
+        thickness = max(1, round(2 * min(scale)))
+    renderer = TrailRenderer(thickness=thickness, smooth=smooth)
+    canvas = np.zeros((height, width, 3), np.uint8)
+
+    points = np.stack((records["x"], records["y"]), axis=1).astype(np.float32)
+    if (scale != 1).any():
+        points = points * scale
+    if not smooth:
+        points = np.rint(points).astype(np.int32)
+    cls = np.clip(np.asarray(records["cls"]), 0, len(colors) - 1)
+    colors = [tuple(color) for color in np.asarray(colors).tolist()]
+
+    previous, start, end = segments(records, ttl)
+    if by_class:
+        order = np.argsort(cls[end], kind="stable")
+        previous, start, end = previous[order], start[order], end[order]
+    for first in range(0, len(end), CHUNK):
+        chunk = slice(first, first + CHUNK)
+        if smooth:
+            lines = renderer.curve(points[previous[chunk]], points[start[chunk]], points[end[chunk]])
+            line_type = cv2.LINE_AA
+        else:
+            lines = np.stack((points[start[chunk]], points[end[chunk]]), axis=1)
+            line_type = cv2.LINE_8
+        # One call per run of segments of the same class
+        lines = list(lines)
+        chunk_cls = cls[end[chunk]]
+        bounds = np.concatenate(([0], np.flatnonzero(np.diff(chunk_cls)) + 1, [len(chunk_cls)])).tolist()
+        for a, b, c in zip(bounds[:-1], bounds[1:], chunk_cls[bounds[:-1]].tolist()):
+            cv2.polylines(canvas, lines[a:b], isClosed=False, color=colors[c],
+                          thickness=thickness, lineType=line_type)
+    return canvas
+
+
+def time_window(records, start=None, end=None):
+    """Records between `start` and `end` seconds from the start of the log (from its end when negative)."""
+    if not len(records) or (start is None and end is None):
+        return records
+    t = np.asarray(records["t"])
+    breaks = np.asarray(records["id"]) == BREAK
+    if breaks.all():
+        return records
+    first, last = t[~breaks].min(), t[~breaks].max()
+    keep = np.ones(len(records), bool)
+    if start is not None:
+        keep &= t >= (last + start if start < 0 else first + start)
+    if end is not None:
+        keep &= t <= (last + end if end < 0 else first + end)
+    return records[keep | breaks]
+
+
+def parse_size(text):
+    width, height = text.lower().split("x")
+    return int(width), int(height)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("log")
+    parser.add_argument("output", help="image file to write")
+    parser.add_argument("--size", type=parse_size, help="output WIDTHxHEIGHT (default: the logged frame size)")
+    parser.add_argument("--thickness", type=int, help="line thickness (default: scaled from the live 2 px)")
+    parser.add_argument("--smooth", action="store_true", help="anti-aliased curved segments")
+    parser.add_argument("--by-class", action="store_true",
+                        help="draw each class in one pass: faster, but crossings may stack differently")
+    parser.add_argument("--ttl", type=float, default=5.0, help="seconds unseen after which a track is split")
+    parser.add_argument("--intensity", type=float, default=1.0, help="scale the trails, as line_intensity does")
+    parser.add_argument("--start", type=float, help="seconds from the start of the log (negative: from its end)")
+    parser.add_argument("--end", type=float, help="seconds from the start of the log (negative: from its end)")
+    args = parser.parse_args()
+
+    begin = time.perf_counter()
+    log_size, records = read_log(args.log)
+    records = time_window(records, args.start, args.end)
+    canvas = render(records, log_size, args.size, args.thickness, args.smooth, args.ttl, args.by_class)
+    if args.intensity != 1.0:
+        canvas = cv2.convertScaleAbs(canvas, alpha=args.intensity)
+    if not cv2.imwrite(args.output, canvas):
+        raise SystemExit(f"could not write {args.output}")
+    print(f"{len(records)} points from {args.log} ({log_size[0]}x{log_size[1]}) rendered to "
+          f"{args.output} ({canvas.shape[1]}x{canvas.shape[0]}) in {time.perf_counter() - begin:.2f} s")
@@ -1,18 +1,28 @@
 # server.py
 
-from flask import Flask
+from flask import Flask, request
 from flask_socketio import SocketIO, emit
-from ultralytics import YOLO
 import base64
 import cv2
 import numpy as np
-from information import class_colors, classNames, excluded_classes
+from information import class_colors, classNames, detector_options, excluded_classes
+from postprocess import allowed_classes, color_lut, extract_detections
+from batch_scheduler import BatchScheduler
+from sessions import SessionManager, apply_tracker
+from frame_codec import CODEC_DETECTIONS, pack_frame, unpack_frame
+from adaptive_encoder import AdaptiveEncoder
+from metrics import Metrics, process_uptime
+from compositor import TrailCompositor
+from overlay import draw_class_colored
+from motion_gate import DetectionScheduler
+from detector_backend import LazyModel
 
 app = Flask(__name__)
 socketio = SocketIO(app)
 
-# Initialize YOLO
-model = YOLO("yolov8l.pt")
+# Initialize YOLO; it is loaded and warmed up in the background from below,
+# and exports take any batch size for the batched predict
+model = LazyModel("yolov8l.pt", **detector_options, dynamic=True)
 
 # Configurable parameters
 line_thickness = 2
@@ -20,88 +30,269 @@ line_intensity = 0.9
 src_img_intensity = 1
 resize_width = 640  # Resize image to 640x480
 resize_height = 480
+trail_history = 100  # Points kept per track
+track_ttl = 5.0  # Seconds before an unseen track is dropped
+smooth_trails = False  # Anti-aliased curved segments
+max_sessions = 4  # Concurrent clients; further connections are refused
+session_idle_timeout = 60  # Seconds without frames before a session is dropped
+batch_size = 4  # Frames from different sessions run through the detector together
+batch_max_wait = 0.02  # Seconds to wait for a batch to fill up
+target_rtt = 0.2  # Seconds; output JPEG quality and resolution drop while the client's RTT is above this
+metrics_local_only = True  # Serve /metrics to loopback clients only
+detect_stride = 1  # Run the detector on at most every Nth frame of a client, predicting the others
+motion_threshold = 0.002  # Fraction of changed pixels below which the detector is skipped (0 disables)
+motion_pixel_threshold = 25  # Grey-level change that counts a pixel as changed
+max_skip = 30  # Frames of a client the detector may skip in a row
 
-previous_positions = {}  # Maps unique IDs to positions
-line_canvas = None
+# Per-stage timings, exposed with queue and session figures at /metrics
+metrics = Metrics()
 
-# Define your class names, colors, and excluded classes
-class_names = model.names  # Assuming model.names contains class names
+# Tracker, trajectories and canvas for each connected client
+sessions = SessionManager(max_sessions=max_sessions, trail_history=trail_history, track_ttl=track_ttl,
+                          line_thickness=line_thickness, smooth_trails=smooth_trails)
+
+# Define your class names, colors, and excluded classes; the tables are
+# filled in once the model has loaded
 excluded_classes = ['person']  # Example: Exclude 'person' class
-class_colors = {name: [int(c) for c in np.random.choice(range(256), size=3)] for name in class_names.values()}
+class_names = {}
+class_colors = {}
+allowed_class_ids = None  # Class IDs the detector is asked for
+class_color_lut = None  # Colors indexed by class ID
+first_frame_time = None  # Seconds from process start to the first reply
+
+def load_class_tables(loaded_model):
+    global class_names, class_colors, allowed_class_ids, class_color_lut
+    class_names = loaded_model.names  # Assuming model.names contains class names
+    class_colors = {name: [int(c) for c in np.random.choice(range(256), size=3)] for name in class_names.values()}
+    allowed_class_ids = allowed_classes(class_names, excluded_classes)
+    class_color_lut = color_lut(class_names, class_colors)
+
+model.on_load = load_class_tables
+model.preload()
 
 @socketio.on('connect')
 def handle_connect():
-    print('Client connected')
+    # Idle clients may still be connected; disconnect them so they reconnect
+    # and get a new session instead of sending frames nobody processes
+    for sid in sessions.reap_idle(session_idle_timeout):
+        worker.discard(sid)
+        socketio.server.disconnect(sid)
+    if not sessions.admit(request.sid):
+        print(f'Refused client: {len(sessions)} sessions already active')
+        raise ConnectionRefusedError('server is at capacity')
+    session = sessions.get(request.sid)
+    session.encoder = AdaptiveEncoder(base_size=(resize_width, resize_height),
+                                      target_rtt=target_rtt, hold=2, name=f'downlink {request.sid}')
+    session.scheduler = DetectionScheduler(stride=detect_stride, motion_threshold=motion_threshold,
+                                           pixel_threshold=motion_pixel_threshold, max_skip=max_skip,
+                                           name=f'gate {request.sid}')
+    print(f'Client connected ({len(sessions)}/{max_sessions} sessions)')
 
 @socketio.on('disconnect')
 def handle_disconnect():
-    print('Client disconnected')
+    sid = request.sid
+    print(f'Client disconnected ({worker.processed[sid]} frames processed, {worker.dropped[sid]} dropped)')
+    worker.discard(sid)
+    sessions.close(sid)
+
+@socketio.on('hello')
+def handle_hello(data):
+    # Clients that never send a hello keep the base64 transport
+    session = sessions.get(request.sid)
+    if session is not None and isinstance(data, dict) and data.get('transport') == 'binary':
+        session.binary = True
+        # Detections-only replies need the binary transport; boxes are in
+        # the coordinates of the resized inference frame
+        session.detections_only = data.get('mode') == 'detections'
+        emit('hello_ack', {'transport': 'binary', 'mode': 'detections' if session.detections_only else 'frames',
+                           'width': resize_width, 'height': resize_height})
+
+@socketio.on('link_stats')
+def handle_link_stats(data):
+    # Clients report their smoothed RTT and encoder settings; clients that
+    # never do keep full quality. The RTT includes the time this server spent
+    # on the frame, which is not link time, so it is reported back and left
+    # out of both ends' throughput estimates
+    session = sessions.get(request.sid)
+    if session is not None and isinstance(data, dict):
+        service_time = worker.latency.mean(request.sid)
+        session.encoder.observe(data.get('rtt'), service_time=service_time)
+        session.uplink_settings = {key: data[key] for key in ('quality', 'width', 'height') if key in data}
+        emit('server_stats', {'service_time': service_time})
 
 @socketio.on('video_frame')
 def handle_video_frame(data):
-    global line_canvas, previous_positions
-    # Decode the image
-    img_data = base64.b64decode(data)
-    np_arr = np.frombuffer(img_data, np.uint8)
-    img = cv2.imdecode(np_arr, cv2.IMREAD_COLOR)
+    # Hand the frame to the inference scheduler and return immediately; a frame
+    # still waiting for this client is replaced and counted as dropped, and the
+    # client is told which one so it stops waiting for an answer to it
+    replaced = worker.submit(request.sid, data)
+    session = sessions.get(request.sid)
+    if session is None:
+        return
+    session.received += 1
+    if replaced is not None and session.pending_id is not None:
+        emit('frame_dropped', {'frame_id': session.pending_id})
+    session.pending_id = frame_number(session, data)
+
+def frame_number(session, data):
+    # Binary frames carry their id; clients number base64 frames from 1 on each connection
+    if isinstance(data, (bytes, bytearray)):
+        try:
+            return unpack_frame(data)[0]
+        except ValueError:
+            return None
+    return session.received
+
+def decode_frame(data):
+    # Binary frames carry a header with the frame id and capture time; legacy
+    # clients send the JPEG as a base64 string
+    with metrics.time('decode'):
+        if isinstance(data, (bytes, bytearray)):
+            try:
+                frame_id, timestamp, _, img_data = unpack_frame(data)
+            except ValueError as e:
+                print(f"Received malformed frame: {e}")
+                return None
+        else:
+            frame_id, timestamp, img_data = None, None, base64.b64decode(data)
+
+        # Decode the image
+        np_arr = np.frombuffer(img_data, np.uint8)
+        img = cv2.imdecode(np_arr, cv2.IMREAD_COLOR)
 
     if img is None:
         print("Received empty frame")
-        return
+        return None
 
     # Resize image
-    resized_img = cv2.resize(img, (resize_width, resize_height))
+    with metrics.time('resize'):
+        return cv2.resize(img, (resize_width, resize_height)), frame_id, timestamp
+
+def process_batch(batch):
+    frames = []
+    for sid, data in batch:
+        session = sessions.get(sid)
+        if session is None:  # disconnected while the frame was pending
+            continue
+        session.touch()
+        decoded = decode_frame(data)
+        if decoded is not None:
+            frames.append((sid, session, decoded))
+    if not frames:
+        return []
+
+    # Frames with no motion, or between strides, skip the detector
+    with metrics.time('motion'):
+        run = [session.scheduler.should_detect(resized_img) for _, session, (resized_img, _, _) in frames]
+
+    # One detector pass for the rest of the batch; tracking stays per session.
+    # Excluded classes are dropped before NMS, so the trackers never see them
+    inputs = [resized_img for (_, _, (resized_img, _, _)), detect in zip(frames, run) if detect]
+    results = iter(())
+    if inputs:
+        with metrics.time('inference'):
+            results = iter(model.predict(inputs, classes=allowed_class_ids, verbose=False))
+
+    output = []
+    for (sid, session, (resized_img, frame_id, timestamp)), detect in zip(frames, run):
+        if detect:
+            detections = track_detections(session, resized_img, next(results))
+        else:
+            detections = session.scheduler.predict()
+        output.append((sid, (frame_id, timestamp, render_frame(session, resized_img, detections))))
+    return output
+
+def track_detections(session, resized_img, result):
+    # Attach this session's track IDs to the batched detections
+    with metrics.time('postprocess'):
+        result = apply_tracker(result, session.tracker, resized_img)
+        return session.scheduler.update(extract_detections([result]))
+
+def render_frame(session, resized_img, detections):
+    # Clients in detections mode composite boxes and trails themselves
+    if session.detections_only:
+        return detections
 
     # Initialize line canvas
-    if line_canvas is None or line_canvas.shape != resized_img.shape:
-        line_canvas = np.zeros_like(resized_img)
-
-    # Run YOLO inference
-    results = model.track(resized_img, stream=True, persist=True)
-    
-    # Process detections
-    for r in results:
-        for box in r.boxes:
-            cls = int(box.cls[0])
-            class_name = class_names.get(cls, 'Unknown')
-
-            if class_name in excluded_classes:
-                continue
-
-            x1, y1, x2, y2 = map(int, box.xyxy[0])
-            current_position = (x1 + (x2 - x1) // 2, y1 + (y2 - y1) // 2)
-            track_id = int(box.id[0])
-            color = class_colors.get(class_name, (255, 255, 255))
-
-            # Draw tracking lines
-            if track_id in previous_positions:
-                previous_positions[track_id].append(current_position)
-                if len(previous_positions[track_id]) > 100:
-                    previous_positions[track_id].pop(0)
-                points = np.array(previous_positions[track_id], np.int32)
-                cv2.polylines(line_canvas, [points], isClosed=False, color=color, thickness=line_thickness)
-            else:
-                previous_positions[track_id] = [current_position]
-
-            # Draw bounding box and label
-            confidence = round(float(box.conf[0]), 2)
-            cv2.rectangle(resized_img, (x1, y1), (x2, y2), color, 2)
-            cv2.putText(resized_img, f'{class_name} {confidence}', (x1, y1 - 10),
-                        cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 1)
-
-    # Overlay lines onto the image
-    img_with_lines = cv2.addWeighted(resized_img, src_img_intensity, line_canvas, line_intensity, 0)
-
-    # Encode image as JPEG
-    # print(img_with_lines.shape)
-    _, img_encoded = cv2.imencode('.jpg', img_with_lines)
-    img_bytes = img_encoded.tobytes()
-    img_base64 = base64.b64encode(img_bytes).decode('utf-8')
-    # # img_with_lines = img_with_lines.tobytes()
-    # # img_base64 = base64.b64encode(img_with_lines).decode('utf-8')
-
-    # Send processed frame back to client
-    emit('processed_frame', img_base64)
+    if session.compositor is None or session.compositor.shape != resized_img.shape:
+        session.compositor = TrailCompositor(resized_img.shape, line_intensity, src_img_intensity)
+    compositor = session.compositor
+    trajectories = session.trajectories
+
+    with metrics.time('draw'):
+        trajectories.evict_stale()
+
+        draw_class_colored(resized_img, compositor, detections, trajectories, session.renderer,
+                           class_names, class_color_lut)
+
+    # Overlay lines onto the image, in place and only where there are trails
+    with metrics.time('blend'):
+        img_with_lines = compositor.blend(resized_img)
+
+    # Encode image as JPEG at the quality and resolution the client's link sustains
+    with metrics.time('encode'):
+        img_encoded, session.output_settings = session.encoder.encode(img_with_lines)
+    return img_encoded
+
+def send_processed_frame(sid, result):
+    global first_frame_time
+    frame_id, timestamp, output = result
+    session = sessions.get(sid)
+    if session is None:  # disconnected during inference
+        return
+    if first_frame_time is None:
+        first_frame_time = process_uptime()
+        print(f"First annotated frame {first_frame_time:.2f} s after start")
+
+    # Send processed frame back to client, echoing the id and capture time
+    if session.detections_only:
+        # Frames sent before the hello was acknowledged carry no id to match
+        if frame_id is not None:
+            payload = pack_frame(frame_id, output.tobytes(), codec=CODEC_DETECTIONS, timestamp=timestamp)
+            socketio.emit('processed_frame', payload, to=sid)
+    elif session.binary and frame_id is not None:
+        socketio.emit('processed_frame', pack_frame(frame_id, output, timestamp=timestamp), to=sid)
+    else:
+        img_base64 = base64.b64encode(output).decode('utf-8')
+        socketio.emit('processed_frame', img_base64, to=sid)
+
+def session_settings(attribute, key):
+    # One encoder setting per session, for sessions that have one yet
+    return {sid: getattr(session, attribute)[key] for sid, session in sessions.items()
+            if key in getattr(session, attribute)}
+
+worker = BatchScheduler(process_batch, send_processed_frame, batch_size=batch_size, max_wait=batch_max_wait).start()
+
+metrics.gauge('detector_ready_seconds', 'Seconds from process start until the detector was loaded and warmed up.',
+              lambda: float('nan') if model.ready_uptime is None else model.ready_uptime)
+metrics.gauge('inference_queue_depth', 'Clients with a frame waiting for inference.', worker.pending)
+metrics.gauge('inference_batch_size', 'Mean frames per detector call.', worker.mean_batch_size)
+metrics.gauge('sessions_active', 'Connected clients.', lambda: len(sessions))
+metrics.gauge('session_fps', 'Frames per second processed for each client.',
+              lambda: {sid: session.fps() for sid, session in sessions.items()}, label='session')
+metrics.gauge('session_latency_seconds', 'Mean time from receiving a frame to sending its reply.',
+              lambda: {sid: worker.latency.mean(sid) for sid, _ in sessions.items()}, label='session')
+metrics.gauge('session_detector_skip_ratio', 'Fraction of each client\'s frames the detector skipped.',
+              lambda: {sid: session.scheduler.skip_ratio() for sid, session in sessions.items()}, label='session')
+metrics.gauge('session_uplink_jpeg_quality', 'JPEG quality each client last reported sending at.',
+              lambda: session_settings('uplink_settings', 'quality'), label='session')
+metrics.gauge('session_uplink_width', 'Frame width each client last reported sending at.',
+              lambda: session_settings('uplink_settings', 'width'), label='session')
+metrics.gauge('session_downlink_jpeg_quality', 'JPEG quality of the last frame sent to each client.',
+              lambda: session_settings('output_settings', 'quality'), label='session')
+metrics.gauge('session_downlink_width', 'Frame width of the last frame sent to each client.',
+              lambda: session_settings('output_settings', 'width'), label='session')
+metrics.gauge('frames_processed_total', 'Frames processed for each client.',
+              lambda: dict(worker.processed), label='session', kind='counter')
+metrics.gauge('frames_dropped_total', 'Frames replaced by a newer one before inference.',
+              lambda: dict(worker.dropped), label='session', kind='counter')
+
+@app.route('/metrics')
+def handle_metrics():
+    # Prometheus text format; scrape from the server itself
+    if metrics_local_only and request.remote_addr not in ('127.0.0.1', '::1'):
+        return 'Forbidden\n', 403
+    return metrics.render(), 200, {'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'}
 
 if __name__ == '__main__':
     socketio.run(app, host='0.0.0.0', port=8888)
\ No newline at end of file
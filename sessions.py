@@ -0,0 +1,121 @@
+import threading
+import time
+from collections import deque
+import torch
+from ultralytics.trackers.bot_sort import BOTSORT
+from ultralytics.trackers.byte_tracker import BYTETracker
+from ultralytics.utils import IterableSimpleNamespace, yaml_load
+from ultralytics.utils.checks import check_yaml
+from trajectory_store import TrajectoryStore
+from trail_renderer import TrailRenderer
+
+TRACKER_MAP = {"bytetrack": BYTETracker, "botsort": BOTSORT}
+
+
+def new_tracker(tracker_cfg="bytetrack.yaml", frame_rate=30):
+    """A standalone tracker, configured the same way model.track() builds its own."""
+    cfg = IterableSimpleNamespace(**yaml_load(check_yaml(tracker_cfg)))
+    return TRACKER_MAP[cfg.tracker_type](args=cfg, frame_rate=frame_rate)
+
+
+def apply_tracker(result, tracker, img):
+    """
+    Run `tracker` on the detections of one predict() Results and return the
+    Results with track IDs attached, as model.track(persist=True) would.
+    """
+    det = result.boxes.cpu().numpy()
+    if len(det) == 0:
+        return result
+    tracks = tracker.update(det, img)
+    if len(tracks) == 0:
+        return result
+    result = result[tracks[:, -1].astype(int)]
+    result.update(boxes=torch.as_tensor(tracks[:, :-1]))
+    return result
+
+
+class Session:
+    """Everything one connected client owns: its tracker, trajectories and canvas."""
+
+    def __init__(self, tracker, trajectories, renderer):
+        self.tracker = tracker
+        self.trajectories = trajectories
+        self.renderer = renderer
+        self.compositor = None  # TrailCompositor, sized by the first frame
+        self.binary = False  # client negotiated binary frames instead of base64
+        self.detections_only = False  # client draws boxes and trails itself
+        self.encoder = None  # AdaptiveEncoder for frames sent back to the client
+        self.output_settings = {}  # encoder settings of the last frame sent back
+        self.uplink_settings = {}  # encoder settings the client last reported sending at
+        self.scheduler = None  # DetectionScheduler deciding which frames reach the detector
+        self.created = self.last_active = time.monotonic()
+        self.frames = 0
+        self.received = 0  # frames received, which numbers base64 frames as their sender does
+        self.pending_id = None  # id of the last frame handed to the inference scheduler
+        self._recent = deque(maxlen=30)  # arrival times of the latest frames
+
+    def touch(self):
+        self.last_active = time.monotonic()
+        self.frames += 1
+        self._recent.append(self.last_active)
+
+    def fps(self):
+        """Frame rate over the last few frames; decays towards 0 once frames stop."""
+        if len(self._recent) < 2:
+            return 0.0
+        return (len(self._recent) - 1) / max(time.monotonic() - self._recent[0], 1e-6)
+
+
+class SessionManager:
+    """
+    Session state keyed by Socket.IO sid, with admission control: at most
+    `max_sessions` clients are admitted at once.
+    """
+
+    def __init__(self, max_sessions=4, tracker_cfg="bytetrack.yaml", trail_history=100,
+                 track_ttl=5.0, line_thickness=2, smooth_trails=False):
+        self.max_sessions = max_sessions
+        self.tracker_cfg = tracker_cfg
+        self.trail_history = trail_history
+        self.track_ttl = track_ttl
+        self.line_thickness = line_thickness
+        self.smooth_trails = smooth_trails
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def admit(self, sid):
+        """Create a session for `sid`; False if the server is at capacity."""
+        with self._lock:
+            if sid in self._sessions:
+                return True
+            if len(self._sessions) >= self.max_sessions:
+                return False
+            self._sessions[sid] = Session(
+                new_tracker(self.tracker_cfg),
+                TrajectoryStore(capacity=self.trail_history, ttl=self.track_ttl),
+                TrailRenderer(thickness=self.line_thickness, smooth=self.smooth_trails),
+            )
+            return True
+
+    def get(self, sid):
+        return self._sessions.get(sid)
+
+    def close(self, sid):
+        with self._lock:
+            return self._sessions.pop(sid, None)
+
+    def reap_idle(self, timeout):
+        """Close sessions that have not sent a frame for `timeout` seconds."""
+        now = time.monotonic()
+        with self._lock:
+            idle = [sid for sid, s in self._sessions.items() if now - s.last_active > timeout]
+            for sid in idle:
+                del self._sessions[sid]
+        return idle
+
+    def items(self):
+        with self._lock:
+            return list(self._sessions.items())
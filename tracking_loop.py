@@ -0,0 +1,150 @@
+import time
+import cv2
+from checkpoint import Checkpointer, load_checkpoint, reassociate
+from compositor import TrailCompositor
+from information import allowed_class_ids
+from memory_monitor import reclaim
+from metrics import Metrics
+from motion_gate import DetectionScheduler
+from overlay import draw_detections
+from postprocess import extract_detections
+from trail_renderer import TrailRenderer
+from trajectory_log import TrajectoryLog
+from trajectory_store import TrajectoryStore
+
+
+class TrackingLoop:
+    """
+    The per-frame work of obj_v2 for one frame source, shared by the entry
+    points that run it (obj_v2, and multi_camera in each worker), fed by a
+    Pipeline: detect() is its inference step, render() its display step.
+
+    detect(img) lets the motion gate skip the detector (predicting the
+    detections instead), otherwise tracks a `resize` copy of the frame with
+    `model.track()` and scales the boxes back to the frame. Every
+    `reclaim_interval` seconds it also trims the tracker's bookkeeping, which
+    is only safe on the inference thread.
+
+    render(img, detections) extends and draws the trails, logs the drawn
+    points to `trajectory_log`, checkpoints the trails to `checkpoint_path`
+    every `checkpoint_interval` seconds, and returns the frame with the
+    trails blended in (or with view="canvas" the trails alone on black). At
+    the first frame it restores the last checkpoint; its tracks continue
+    under the new tracker's IDs with the first tracked detections within
+    `restore_distance` pixels of where they ended. close() writes a final
+    checkpoint.
+    """
+
+    def __init__(self, model, resize=(640, 480), trail_history=100, track_ttl=5.0, line_thickness=2,
+                 smooth_trails=False, line_intensity=0.9, src_intensity=1, detect_stride=1,
+                 motion_threshold=0.002, motion_pixel_threshold=25, max_skip=30, trajectory_log=None,
+                 checkpoint_path=None, checkpoint_interval=5, restore_distance=80, reclaim_interval=60,
+                 view="overlay", metrics=None, verbose=True, name="gate"):
+        self.model = model
+        self.resize = resize
+        self.track_ttl = track_ttl
+        self.line_intensity = line_intensity
+        self.src_intensity = src_intensity
+        self.trajectory_log = trajectory_log
+        self.checkpoint_path = checkpoint_path
+        self.restore_distance = restore_distance
+        self.reclaim_interval = reclaim_interval
+        self.view = view
+        self.verbose = verbose
+        self.metrics = metrics if metrics is not None else Metrics()
+        self.trajectories = TrajectoryStore(capacity=trail_history, ttl=track_ttl)
+        self.renderer = TrailRenderer(thickness=line_thickness, smooth=smooth_trails)
+        self.compositor = None  # created at the first frame's size
+        self.log = None
+
+        # Skip the detector on still or in-between frames; their tracks are predicted
+        self.gate = DetectionScheduler(stride=detect_stride, motion_threshold=motion_threshold,
+                                       pixel_threshold=motion_pixel_threshold, max_skip=max_skip, name=name)
+
+        # Carry on with the trails of the last run
+        self.checkpoint = load_checkpoint(checkpoint_path) if checkpoint_path else None
+        self.checkpointer = Checkpointer(checkpoint_path, checkpoint_interval) if checkpoint_path else None
+        self._restored = None  # checkpoint whose tracks wait for the first tracked detections
+        self._restore_deadline = None
+        self._last_reclaim = time.time()
+
+    def detect(self, img):
+        # The tracker lists are only safe to trim here, on the inference
+        # thread; trajectories are evicted on the display thread every frame
+        if time.time() - self._last_reclaim > self.reclaim_interval:
+            reclaim(model=self.model)
+            self._last_reclaim = time.time()
+
+        with self.metrics.time("motion"):
+            if not self.gate.should_detect(img):
+                return self.gate.predict()
+
+        with self.metrics.time("resize"):
+            resized_img = cv2.resize(img, self.resize)
+
+        # Get YOLO detections; excluded classes are dropped before NMS and tracking.
+        # The stream is consumed here so the timing covers the inference itself
+        with self.metrics.time("inference"):
+            results = list(self.model.track(resized_img, stream=True, persist=True, classes=allowed_class_ids,
+                                            verbose=self.verbose))
+
+        # Scaled boxes and centroids for all detections at once
+        with self.metrics.time("postprocess"):
+            scale_x, scale_y = img.shape[1] / self.resize[0], img.shape[0] / self.resize[1]
+            return self.gate.update(extract_detections(results, scale_x, scale_y))
+
+    def _start(self, img):
+        # Create black canvas for drawing lines
+        self.compositor = TrailCompositor(img.shape, self.line_intensity, self.src_intensity)
+        checkpoint, self.checkpoint = self.checkpoint, None
+        if checkpoint is not None:
+            if checkpoint["canvas"].shape == img.shape:
+                self.compositor.load(checkpoint["canvas"])
+                self._restored, self._restore_deadline = checkpoint, time.monotonic() + self.track_ttl
+                print(f"Restored the trails of the last run from {self.checkpoint_path}")
+            else:
+                print(f"Not restoring {self.checkpoint_path}: its canvas is {checkpoint['canvas'].shape}, "
+                      f"frames are {img.shape}")
+        if self.trajectory_log:
+            try:
+                self.log = TrajectoryLog(self.trajectory_log, (img.shape[1], img.shape[0]))
+            except ValueError as e:
+                print(f"Not logging trajectories: {e}")
+
+    def _continue_restored(self, detections):
+        # The first tracked detections pick up the restored tracks; any not
+        # picked up within track_ttl are not coming back
+        if (detections["id"] >= 0).any():
+            continued = reassociate(self._restored, detections, self.restore_distance)
+            self.trajectories.restore(continued)
+            print(f"Continued {len(continued['ids'])} of {len(self._restored['ids'])} tracks of the last run")
+            self._restored = None
+        elif time.monotonic() > self._restore_deadline:
+            self._restored = None
+
+    def render(self, img, detections):
+        """Draw `detections` on `img` (in place) and return the output frame."""
+        if self.compositor is None:
+            self._start(img)
+        if self._restored is not None:
+            self._continue_restored(detections)
+
+        with self.metrics.time("draw"):
+            self.trajectories.evict_stale()
+            draw_detections(img, self.compositor, detections, self.trajectories, self.renderer)
+            if self.log is not None:
+                self.log.append(detections)
+
+        # Snapshot the trails now and then; written on a background thread
+        if self.checkpointer is not None:
+            self.checkpointer.maybe_save(self.compositor.canvas, self.trajectories)
+
+        # Overlay the line canvas onto the frame, in place and only where there are trails
+        with self.metrics.time("blend"):
+            return self.compositor.blend(img) if self.view == "overlay" else self.compositor.over_black()
+
+    def close(self):
+        if self.log is not None:
+            self.log.close()
+        if self.checkpointer is not None and self.compositor is not None:
+            self.checkpointer.save(self.compositor.canvas, self.trajectories, wait=True)
@@ -0,0 +1,61 @@
+import cv2
+import numpy as np
+
+
+class TrailRenderer:
+    """
+    Draws trails onto a persistent canvas one segment at a time.
+
+    The canvas keeps everything drawn on earlier frames, so each call only has
+    to rasterize the span between a track's last two positions instead of the
+    whole history. With `smooth` set, that span is drawn as an anti-aliased
+    Hermite curve whose start tangent follows the previous point, which keeps
+    consecutive segments joined without visible corners.
+
+    draw() returns the (x, y, w, h) rectangle it may have touched, for
+    TrailCompositor.mark().
+    """
+
+    def __init__(self, thickness=2, smooth=False, samples=8):
+        self.thickness = thickness
+        self.smooth = smooth
+        self.samples = samples
+        t = np.linspace(0.0, 1.0, samples + 1)[:, None]
+        # Cubic Hermite basis for p1, p2, m1, m2
+        self._basis = (2 * t**3 - 3 * t**2 + 1, -2 * t**3 + 3 * t**2, t**3 - 2 * t**2 + t, t**3 - t**2)
+
+    def draw(self, canvas, points, color):
+        """Draw the newest segment of `points` (oldest first, as from TrajectoryStore.tail)."""
+        if len(points) < 2:
+            return None
+
+        if not self.smooth:
+            p1, p2 = tuple(map(int, points[-2])), tuple(map(int, points[-1]))
+            cv2.line(canvas, p1, p2, color, self.thickness)
+            return self._bounds(min(p1[0], p2[0]), min(p1[1], p2[1]), max(p1[0], p2[0]), max(p1[1], p2[1]))
+
+        p1 = points[-2].astype(np.float32)
+        p2 = points[-1].astype(np.float32)
+        p0 = points[-3].astype(np.float32) if len(points) > 2 else p1
+        curve = self.curve(p0, p1, p2)
+        cv2.polylines(canvas, [curve], isClosed=False, color=color, thickness=self.thickness, lineType=cv2.LINE_AA)
+        (x0, y0), (x1, y1) = curve.min(axis=0), curve.max(axis=0)
+        return self._bounds(int(x0), int(y0), int(x1), int(y1))
+
+    def curve(self, p0, p1, p2):
+        """
+        The smooth segment from p1 to p2 (float32, previous point p0) as
+        `samples` + 1 int32 points. Also takes (n, 2) arrays of points and
+        returns (n, samples + 1, 2), for drawing many segments at once.
+        """
+        p0, p1, p2 = p0[..., None, :], p1[..., None, :], p2[..., None, :]
+        m1 = (p2 - p0) * 0.5
+        m2 = p2 - p1
+        h00, h01, h10, h11 = self._basis
+        curve = h00 * p1 + h01 * p2 + h10 * m1 + h11 * m2
+        return np.rint(curve).astype(np.int32)
+
+    def _bounds(self, x0, y0, x1, y1):
+        # Room for the line's thickness and anti-aliased edge
+        pad = self.thickness // 2 + 2
+        return x0 - pad, y0 - pad, x1 - x0 + 2 * pad + 1, y1 - y0 + 2 * pad + 1
@@ -0,0 +1,102 @@
+import os
+import struct
+import time
+import numpy as np
+
+# File layout: a 16-byte header (magic, then the width and height of the frame
+# the points are in) followed by fixed-size little-endian records
+MAGIC = b"TRAILS01"
+HEADER = struct.Struct("<8sII")
+LOG_DTYPE = np.dtype([
+    ("t", "<f8"),  # frame time, time.time() unless given
+    ("id", "<i4"),  # track ID, or BREAK (whose other fields are 0)
+    ("cls", "<i2"),
+    ("x", "<i4"), ("y", "<i4"),
+])
+BREAK = -1  # Record ID written when a log is reopened: track IDs restart after it
+
+
+class TrajectoryLog:
+    """
+    Append-only binary log of the track points that are drawn, one LOG_DTYPE
+    record per tracked detection per frame, so trails outlive the process and
+    can be re-rendered with replay_trails.py.
+
+    Records go through a `buffer_size` write buffer that is flushed at least
+    every `flush_interval` seconds; a crash loses at most that much. Reopening
+    an existing log appends to it, after a BREAK record so track IDs reused
+    by the new run are not joined to the old ones.
+    """
+
+    def __init__(self, path, frame_size, buffer_size=1 << 16, flush_interval=5.0):
+        self.path = path
+        self.frame_size = tuple(frame_size)
+        self.flush_interval = flush_interval
+        self.records = 0
+        existing = os.path.exists(path) and os.path.getsize(path) >= HEADER.size
+        if existing:
+            logged_size, _ = read_header(path)
+            if logged_size != self.frame_size:
+                raise ValueError(f"{path} holds points for a {logged_size[0]}x{logged_size[1]} frame, "
+                                 f"not {self.frame_size[0]}x{self.frame_size[1]}; log to another file")
+            # Drop a record cut short by a crash so the records stay aligned
+            body = os.path.getsize(path) - HEADER.size
+            if body % LOG_DTYPE.itemsize:
+                os.truncate(path, os.path.getsize(path) - body % LOG_DTYPE.itemsize)
+        self._file = open(path, "ab" if existing else "wb", buffering=buffer_size)
+        if existing:
+            marker = np.zeros(1, LOG_DTYPE)
+            marker["id"] = BREAK
+            self._file.write(marker.tobytes())
+        else:
+            self._file.write(HEADER.pack(MAGIC, *self.frame_size))
+        self._last_flush = time.monotonic()
+
+    def append(self, detections, timestamp=None):
+        """Log the tracked rows of a DETECTION_DTYPE array, as drawn at `timestamp`."""
+        tracked = detections[detections["id"] >= 0]
+        if len(tracked):
+            records = np.empty(len(tracked), LOG_DTYPE)
+            records["t"] = time.time() if timestamp is None else timestamp
+            records["id"] = tracked["id"]
+            records["cls"] = tracked["cls"]
+            records["x"] = tracked["cx"]
+            records["y"] = tracked["cy"]
+            self._file.write(records.tobytes())
+            self.records += len(records)
+        if time.monotonic() - self._last_flush > self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        self._file.flush()
+        self._last_flush = time.monotonic()
+
+    def close(self):
+        if not self._file.closed:
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def read_header(path):
+    """((width, height), record count) of a log."""
+    with open(path, "rb") as f:
+        magic, width, height = HEADER.unpack(f.read(HEADER.size))
+    if magic != MAGIC:
+        raise ValueError(f"{path} is not a trajectory log")
+    return (width, height), (os.path.getsize(path) - HEADER.size) // LOG_DTYPE.itemsize
+
+
+def read_log(path):
+    """
+    (frame size, records) of a log. The records are a read-only memory map,
+    so even a log of many hours opens instantly and is paged in as it is used.
+    """
+    frame_size, count = read_header(path)
+    if count == 0:
+        return frame_size, np.empty(0, LOG_DTYPE)
+    return frame_size, np.memmap(path, LOG_DTYPE, mode="r", offset=HEADER.size, shape=(count,))
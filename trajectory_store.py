@@ -0,0 +1,144 @@
+import time
+import numpy as np
+
+
+class _Track:
+    __slots__ = ("points", "head", "count", "last_seen")
+
+    def __init__(self, points, now):
+        self.points = points  # (capacity, 2) int32 ring buffer
+        self.head = 0  # index of the next write
+        self.count = 0
+        self.last_seen = now
+
+
+class TrajectoryStore:
+    """
+    Fixed-capacity NumPy ring buffers of (x, y) positions, one per track ID.
+
+    Tracks idle for longer than `ttl` seconds are dropped by evict_stale(), and
+    at most `max_tracks` tracks are kept (the least recently seen one is evicted
+    to make room), so memory use never exceeds nbytes_ceiling().
+    """
+
+    def __init__(self, capacity=100, ttl=5.0, max_tracks=256):
+        self.capacity = capacity
+        self.ttl = ttl
+        self.max_tracks = max_tracks
+        self._tracks = {}
+        self._free = []  # buffers of evicted tracks, reused for new ones
+
+    def __contains__(self, track_id):
+        return track_id in self._tracks
+
+    def __len__(self):
+        return len(self._tracks)
+
+    def track_ids(self):
+        return list(self._tracks)
+
+    def append(self, track_id, position, now=None):
+        """Record a position for a track and return its number of stored points."""
+        if now is None:
+            now = time.monotonic()
+
+        track = self._tracks.get(track_id)
+        if track is None:
+            track = self._new_track(track_id, now)
+
+        track.points[track.head] = position
+        track.head = (track.head + 1) % self.capacity
+        track.count = min(track.count + 1, self.capacity)
+        track.last_seen = now
+        return track.count
+
+    def _new_track(self, track_id, now):
+        if len(self._tracks) >= self.max_tracks:
+            oldest = min(self._tracks, key=lambda t: self._tracks[t].last_seen)
+            self.remove(oldest)
+        buffer = self._free.pop() if self._free else np.empty((self.capacity, 2), np.int32)
+        track = self._tracks[track_id] = _Track(buffer, now)
+        return track
+
+    def points(self, track_id):
+        """Stored positions of a track, oldest first, as an (n, 2) int32 array."""
+        return self.tail(track_id, self.capacity)
+
+    def tail(self, track_id, n):
+        """The last `n` positions of a track, oldest first."""
+        track = self._tracks[track_id]
+        n = min(n, track.count)
+        start = track.head - n
+        if start >= 0:
+            return track.points[start:track.head].copy()
+        return np.concatenate((track.points[start:], track.points[:track.head]))
+
+    def last_seen(self, track_id):
+        return self._tracks[track_id].last_seen
+
+    def remove(self, track_id):
+        track = self._tracks.pop(track_id, None)
+        if track is not None and len(self._free) < self.max_tracks:
+            self._free.append(track.points)
+
+    def evict_stale(self, now=None):
+        """Drop tracks not updated within `ttl` seconds and return their IDs."""
+        if now is None:
+            now = time.monotonic()
+        stale = [t for t, track in self._tracks.items() if now - track.last_seen > self.ttl]
+        for track_id in stale:
+            self.remove(track_id)
+        return stale
+
+    def state(self, now=None):
+        """
+        All tracks as arrays, e.g. for a checkpoint: "ids", "counts", "ages"
+        (seconds since each was last seen) and "points", (tracks, capacity, 2)
+        with each track's positions oldest first.
+        """
+        if now is None:
+            now = time.monotonic()
+        ids = list(self._tracks)
+        points = np.zeros((len(ids), self.capacity, 2), np.int32)
+        for i, track_id in enumerate(ids):
+            stored = self.points(track_id)
+            points[i, :len(stored)] = stored
+        tracks = [self._tracks[track_id] for track_id in ids]
+        return {
+            "ids": np.array(ids, np.int64),
+            "counts": np.array([track.count for track in tracks], np.int32),
+            "ages": np.array([now - track.last_seen for track in tracks], np.float64),
+            "points": points,
+        }
+
+    def restore(self, state, now=None):
+        """
+        Add the tracks of a state() snapshot, replacing tracks with the same
+        IDs. Ages carry over, so tracks that were about to expire are dropped
+        by the next evict_stale() as they would have been.
+        """
+        if now is None:
+            now = time.monotonic()
+        for track_id, count, age, points in zip(state["ids"].tolist(), state["counts"].tolist(),
+                                                state["ages"].tolist(), state["points"]):
+            self.remove(track_id)
+            count = min(count, len(points))
+            kept = min(count, self.capacity)  # the newest, if this store holds fewer points
+            track = self._new_track(track_id, now - age)
+            track.points[:kept] = points[count - kept:count]
+            track.count = kept
+            track.head = kept % self.capacity
+
+    def clear(self):
+        for track_id in list(self._tracks):
+            self.remove(track_id)
+
+    def nbytes(self):
+        """Bytes currently held in point buffers, including the reuse pool."""
+        return (len(self._tracks) + len(self._free)) * self.capacity * 2 * 4
+
+    def nbytes_ceiling(self):
+        """Upper bound on nbytes() for this configuration."""
+        # A buffer is only allocated when the reuse pool is empty, so live and
+        # pooled buffers together never outnumber max_tracks.
+        return self.max_tracks * self.capacity * 2 * 4